@@ -0,0 +1,298 @@
+# src/article_server.py
+import time
+import signal
+import asyncio
+import argparse
+from pathlib import Path
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional
+
+from autocomplete import MAX_K, Autocomplete
+from batch_clean_and_convert import JSON_ROOT, MANIFEST_PATH, iter_json_laws, node_context, resolve_alias
+from compact_tree import NONE, CompactCorpus
+from conversion_daemon import HttpError, read_request, write_response
+from query_cache import corpus_version
+from search import SearchIndex, law_documents
+
+# === CONFIGURATION ===
+HOST = "127.0.0.1"
+PORT = 8766
+BACKLOG = 1024
+# Intervalle de surveillance du manifeste pour le rechargement à chaud
+RELOAD_INTERVAL = 2.0
+# Latences conservées par route (p50/p99 sur les dernières requêtes) et
+# fenêtre du débit instantané
+LATENCY_SAMPLES = 10000
+THROUGHPUT_WINDOW = 10.0
+MAX_RESULTS = 100
+
+# === 1. INSTANTANÉ DU CORPUS ===
+class CorpusSnapshot:
+    """Le corpus converti chargé une fois : arbre compact (021) pour les
+    articles et sous-arbres, index BM25 en mémoire pour la recherche, tableau
+    des titres pour l'autocomplétion. Un instantané n'est jamais modifié : le
+    rechargement en construit un autre."""
+
+    def __init__(self, json_root: Path = JSON_ROOT):
+        start = time.perf_counter()
+        self.version = corpus_version((MANIFEST_PATH,))
+        # Copies dédoublonnées : servies sous leur propre clé (renvoi "ref")
+        self.aliases: Dict[str, str] = {}
+        laws = list(iter_json_laws(json_root, aliases=self.aliases))
+        self.tree = CompactCorpus.from_laws(laws)
+        self.search_index = SearchIndex.build(doc for key, law in laws for doc in law_documents(key, law))
+        self.titles = Autocomplete.build(laws)
+        # Contexte précalculé à la conversion, dans l'ordre préfixe de l'arbre
+        # compact : l'entrée d'un nœud est à l'indice (nœud − premier nœud)
+        self.context = [law.get("context") or node_context(law["intro"], law["structure"]) for _, law in laws]
+        # Identifiant "<clé>#<chemin>" → nœud, en un passage dans l'ordre
+        # préfixe (le parent précède ses enfants)
+        self.node_ids: Dict[str, int] = {}
+        for key, law in self.tree.keys.items():
+            paths: Dict[int, str] = {}
+            for node in self.tree.law_nodes(law):
+                parent = self.tree.parent[node]
+                position = str(self.tree.position[node])
+                paths[node] = position if parent == NONE else f"{paths[parent]}/{position}"
+                self.node_ids[f"{key}#{paths[node]}"] = node
+        self.laws = [{"key": key, "title": law["title"],
+                      "articles": sorted({self.tree.number[n] for n in self.tree.law_nodes(self.tree.keys[key])
+                                          if self.tree.node_type(n) == 'مادة'})}
+                     for key, law in laws]
+        self.loaded_at = time.time()
+        self.seconds = time.perf_counter() - start
+
+    def resolve(self, key: str) -> str:
+        return resolve_alias(self.aliases, key)
+
+    def find_node(self, key: str, path: str) -> Optional[int]:
+        return self.node_ids.get(f"{self.resolve(key)}#{path}")
+
+    def node_context(self, node: int) -> Dict[str, Any]:
+        law = self.tree.law_of(node)
+        return self.context[law][node - self.tree.laws["first_node"][law]]
+
+    def node_by_id(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """Nœud désigné comme dans les renvois et la recherche : "<clé>#<chemin>"."""
+        key, _, path = node_id.partition("#")
+        return self.subtree(key, path) if path else None
+
+    def article(self, key: str, number: int) -> List[Dict[str, Any]]:
+        return [dict(self.tree.node_json(n), context=self.node_context(n))
+                for n in self.tree.articles(self.resolve(key), number)]
+
+    def subtree(self, key: str, path: str) -> Optional[Dict[str, Any]]:
+        if not path:
+            return self.tree.to_law(self.resolve(key))
+        node = self.find_node(key, path)
+        if node is None:
+            return None
+        return dict(self.tree.node_json(node), context=self.node_context(node))
+
+# === 2. LATENCES ET DÉBIT ===
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.samples: deque = deque(maxlen=LATENCY_SAMPLES)  # (fin, latence en s)
+
+    def record(self, finished: float, latency: float, ok: bool):
+        self.count += 1
+        self.errors += not ok
+        self.samples.append((finished, latency))
+
+    def summary(self, now: float) -> Dict[str, Any]:
+        latencies = sorted(latency for _, latency in self.samples)
+        recent = sum(1 for finished, _ in self.samples if finished >= now - THROUGHPUT_WINDOW)
+
+        def percentile(q: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3, 3) if latencies else 0.0
+
+        return {"requests": self.count, "errors": self.errors, "p50_ms": percentile(0.50),
+                "p99_ms": percentile(0.99), "rps": round(recent / THROUGHPUT_WINDOW, 1)}
+
+# === 3. SERVICE ===
+def int_k(query: Dict[str, str], limit: int) -> int:
+    """Paramètre k (nombre de résultats, 10 par défaut) : entier positif,
+    ramené à `limit`."""
+    try:
+        k = int(query.get("k", 10))
+    except ValueError:
+        raise HttpError(400, "paramètre k : entier attendu")
+    if k < 1:
+        raise HttpError(400, "paramètre k : entier positif attendu")
+    return min(k, limit)
+
+class ArticleService:
+    """GET /article?law=…&number=…, /subtree?law=…&path=0/3,
+    /node?id=<clé>#0/3/1, /search?q=…&k=…, /complete?q=…&k=…, /laws,
+    /metrics, /health ; POST /reload. Chaque requête lit `self.snapshot` une
+    seule fois : le remplacement de l'instantané est une simple affectation,
+    une requête en cours termine sur l'ancien."""
+
+    def __init__(self, json_root: Path = JSON_ROOT):
+        self.json_root = json_root
+        self.snapshot: Optional[CorpusSnapshot] = None
+        # Un seul processus de construction : le build est du Python pur qui
+        # tient le GIL, dans un thread il bloquerait la boucle
+        self.pool = ProcessPoolExecutor(max_workers=1)
+        self.reload_lock = asyncio.Lock()
+        self.reloads = 0
+        self.started = time.monotonic()
+        self.stats: Dict[str, RouteStats] = {}
+        self.routes = {"/article": self.article, "/subtree": self.subtree, "/node": self.node, "/search": self.search,
+                       "/complete": self.complete, "/laws": self.list_laws, "/metrics": self.metrics, "/health": self.health}
+
+    async def reload(self, force: bool = False) -> bool:
+        """Construit le nouvel instantané dans le processus de construction,
+        le reçoit par pickle (quelques ms contre ~0,5 s de build) puis le
+        publie ; en cas d'échec (build à moitié écrit…), l'ancien reste en
+        service."""
+        async with self.reload_lock:
+            if not force and self.snapshot is not None and corpus_version((MANIFEST_PATH,)) == self.snapshot.version:
+                return False
+            try:
+                snapshot = await asyncio.get_running_loop().run_in_executor(self.pool, CorpusSnapshot, self.json_root)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self.pool = ProcessPoolExecutor(max_workers=1)
+                if self.snapshot is None:
+                    raise
+                print(f"Rechargement abandonné, corpus précédent conservé : {type(e).__name__}: {e}")
+                return False
+            self.snapshot = snapshot
+            self.reloads += 1
+            print(f"Corpus chargé : {len(snapshot.laws)} lois | {len(snapshot.tree)} nœuds | "
+                  f"{len(snapshot.search_index.docs)} documents | {snapshot.seconds:.2f} s")
+            return True
+
+    async def watch(self):
+        # Le manifeste est écrit en dernier par process_all_files et par la
+        # fusion des shards : son changement signale un build terminé.
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            await self.reload()
+
+    # --- routes ---
+    def article(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        try:
+            number = int(query.get("number", ""))
+        except ValueError:
+            raise HttpError(400, "paramètre number : entier attendu")
+        key = query.get("law", "")
+        if snapshot.resolve(key) not in snapshot.tree.keys:
+            raise HttpError(404, f"loi inconnue : {key}")
+        return {"law": key, "number": number, "articles": snapshot.article(key, number)}
+
+    def subtree(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        key, path = query.get("law", ""), query.get("path", "").strip("/")
+        result = snapshot.subtree(key, path)
+        if result is None:
+            raise HttpError(404, f"nœud introuvable : {key}#{path}")
+        return result
+
+    def node(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        # Identifiants des renvois et de la recherche ; context.prev / next /
+        # parent donnent le chemin dans la même loi
+        node_id = query.get("id", "")
+        result = snapshot.node_by_id(node_id)
+        if result is None:
+            raise HttpError(404, f"nœud introuvable : {node_id}")
+        return result
+
+    def search(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        if not query.get("q", "").strip():
+            raise HttpError(400, "paramètre q : requête attendue")
+        k = int_k(query, MAX_RESULTS)
+        return {"query": query["q"], "results": snapshot.search_index.search(query["q"], k)}
+
+    def complete(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        k = int_k(query, MAX_K)
+        return {"query": query.get("q", ""), "completions": snapshot.titles.complete(query.get("q", ""), k)}
+
+    def list_laws(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        return {"laws": snapshot.laws}
+
+    def metrics(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        now = time.monotonic()
+        return {"uptime": round(now - self.started, 1), "reloads": self.reloads,
+                "corpus_loaded_at": snapshot.loaded_at,
+                "routes": {route: stats.summary(now) for route, stats in sorted(self.stats.items())}}
+
+    def health(self, snapshot: CorpusSnapshot, query: Dict[str, str]):
+        return {"status": "ok", "laws": len(snapshot.laws), "nodes": len(snapshot.tree)}
+
+    async def dispatch(self, method: str, target: str) -> Dict[str, Any]:
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/reload":
+            if method != "POST":
+                raise HttpError(405, f"{method} {url.path}")
+            return {"reloaded": await self.reload(force=True)}
+        handler = self.routes.get(url.path)
+        if handler is None:
+            raise HttpError(404, f"{method} {url.path}")
+        if method != "GET":
+            raise HttpError(405, f"{method} {url.path}")
+        return handler(self.snapshot, query)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as e:
+                    write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, _ = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                start = time.monotonic()
+                try:
+                    status, payload = 200, await self.dispatch(method, target)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                write_response(writer, status, payload, keep_alive)
+                finished = time.monotonic()
+                route = urlsplit(target).path if status != 404 else "(inconnue)"
+                self.stats.setdefault(route, RouteStats()).record(finished, finished - start, status == 200)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+async def serve(host: str = HOST, port: int = PORT, json_root: Path = JSON_ROOT, watch: bool = True):
+    service = ArticleService(json_root)
+    await service.reload(force=True)
+    server = await asyncio.start_server(service.handle, host, port, backlog=BACKLOG)
+    print(f"Service des articles : http://{host}:{port} | GET /article, /subtree, /node, /search, /complete, /laws, /metrics")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    watcher = asyncio.create_task(service.watch()) if watch else None
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        service.pool.shutdown(cancel_futures=True)
+        print("Service arrêté")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service local des articles (corpus préchargé en mémoire).")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--no-watch", action="store_true", help="ne pas recharger automatiquement après un build")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, watch=not args.no_watch))
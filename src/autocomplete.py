@@ -0,0 +1,165 @@
+# src/autocomplete.py
+import re
+import sys
+import json
+import time
+import heapq
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import List, Dict, Any, Iterable
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT, LEVEL_ORDER, iter_json_laws
+from search import normalize_arabic
+
+# === CONFIGURATION ===
+COMPLETE_PATH = BASE_DIR / "corpus" / "autocomplete.json"
+COMPLETE_VERSION = 1
+MAX_K = 20
+# Préfixes courts (beaucoup de candidats) : meilleurs résultats précalculés
+HEAD_CHARS = 4
+# Les intitulés d'articles contiennent souvent le début de leur contenu
+TITLE_WORDS = 16
+
+# Horodatage des noms de fichiers, devenu " 1707225933208" dans le titre
+TITLE_TIMESTAMP_RE = re.compile(r'\s+\d{13}$')
+NON_WORD_RE = re.compile(r'(?:(?<!\d)\.|\.(?!\d)|[^\w.])+')
+# Rang des catégories : titres de lois d'abord, puis sections de haut en bas
+KINDS = ["loi"] + LEVEL_ORDER
+
+def normalize_title(text: str) -> str:
+    """Même repli que la recherche (hamzas, voyelles, tatweel, "ا لمادة"),
+    ligature lam-alif inversée ("األعلى"), ponctuation → espace ; les points
+    des numéros ("1.15.83") sont conservés."""
+    text = normalize_arabic(text).replace('اال', 'الا')
+    return NON_WORD_RE.sub(" ", text).strip()
+
+def display_title(text: str, words: int = TITLE_WORDS) -> str:
+    text = TITLE_TIMESTAMP_RE.sub("", " ".join(text.split()))
+    parts = text.split(" ")
+    return text if len(parts) <= words else " ".join(parts[:words]) + " …"
+
+# === 1. CONSTRUCTION ===
+def title_entries(laws: Iterable[tuple]) -> Iterable[tuple]:
+    """(texte affiché, catégorie, clé de la loi, chemin du nœud ou None)."""
+    for key, law in laws:
+        yield display_title(law["title"]), "loi", key, None
+        stack = [(law["structure"], "")]
+        while stack:
+            nodes, prefix = stack.pop()
+            for i, node in enumerate(nodes):
+                path = f"{prefix}{i}"
+                if node["title"].strip():
+                    yield display_title(node["title"]), node["type"], key, path
+                if node["children"]:
+                    stack.append((node["children"], path + "/"))
+
+class Autocomplete:
+    """Tableau trié des suffixes de titres commençant à un début de mot
+    ("المجلس الأعلى" trouve aussi "النظام الداخلي للمجلس الأعلى"… dès le mot
+    "المجلس") : un préfixe est une plage contiguë trouvée par bisection.
+    Chaque ligne porte un rang global (début de titre, catégorie, longueur) ;
+    pour les préfixes d'au plus HEAD_CHARS caractères, les MAX_K meilleures
+    entrées sont précalculées."""
+
+    def __init__(self, entries: List[list], keys: List[str], rows, ranks, head: Dict[str, List[int]]):
+        self.entries = entries
+        self.keys = keys
+        self.rows = rows
+        self.ranks = ranks
+        self.head = head
+        self.law_titles = {entry[2]: entry[0] for entry in entries if entry[1] == "loi"}
+
+    @classmethod
+    def build(cls, laws: Iterable[tuple]) -> "Autocomplete":
+        entries = [list(entry) for entry in dict.fromkeys(title_entries(laws))]
+        suffixes = []
+        for entry_id, (text, kind, _, _) in enumerate(entries):
+            normalized = normalize_title(text.rstrip(" …"))
+            for match in re.finditer(r'\S+', normalized):
+                suffixes.append((normalized[match.start():], entry_id, match.start()))
+        # Rang : correspondance en début de titre, catégorie, titre court
+        order = sorted(range(len(suffixes)), key=lambda i: (
+            suffixes[i][2] > 0, KINDS.index(entries[suffixes[i][1]][1]),
+            len(entries[suffixes[i][1]][0]), entries[suffixes[i][1]][0], suffixes[i][2]))
+        rank_of = [0] * len(suffixes)
+        for rank, i in enumerate(order):
+            rank_of[i] = rank
+
+        head: Dict[str, List[int]] = {}
+        for i in order:
+            key, entry_id, _ = suffixes[i]
+            for length in range(1, min(HEAD_CHARS, len(key)) + 1):
+                best = head.setdefault(key[:length], [])
+                if len(best) < MAX_K and entry_id not in best:
+                    best.append(entry_id)
+
+        by_key = sorted(range(len(suffixes)), key=lambda i: suffixes[i][0])
+        return cls(entries, [suffixes[i][0] for i in by_key], array('I', (suffixes[i][1] for i in by_key)),
+                   array('I', (rank_of[i] for i in by_key)), head)
+
+    # === 2. COMPLÉTION ===
+    def complete(self, prefix: str, k: int = 10) -> List[Dict[str, Any]]:
+        query = normalize_title(prefix)
+        if not query:
+            return []
+        k = max(1, min(k, MAX_K))
+        if len(query) <= HEAD_CHARS:
+            ids = self.head.get(query, [])[:k]
+        else:
+            low = bisect_left(self.keys, query)
+            high = bisect_left(self.keys, query + "\U0010ffff", low)
+            best: Dict[int, int] = {}
+            for row in range(low, high):
+                entry_id, rank = self.rows[row], self.ranks[row]
+                if rank < best.get(entry_id, rank + 1):
+                    best[entry_id] = rank
+            ids = heapq.nsmallest(k, best, key=best.get)
+        return [self.entry(i) for i in ids]
+
+    def entry(self, entry_id: int) -> Dict[str, Any]:
+        text, kind, law, path = self.entries[entry_id]
+        return {"text": text, "kind": kind, "law": law, "law_title": self.law_titles.get(law), "path": path}
+
+    # === 3. PERSISTANCE ===
+    def save(self, path: Path = COMPLETE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": COMPLETE_VERSION, "entries": self.entries, "keys": self.keys,
+                "rows": self.rows.tolist(), "ranks": self.ranks.tolist(), "head": self.head}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = COMPLETE_PATH) -> "Autocomplete":
+        if not path.exists():
+            raise FileNotFoundError(f"Index d'autocomplétion introuvable : {path} (lancer autocomplete.py --build)")
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != COMPLETE_VERSION:
+            raise ValueError(f"Index d'autocomplétion incompatible : {path}")
+        return cls(data["entries"], data["keys"], array('I', data["rows"]), array('I', data["ranks"]), data["head"])
+
+def build_autocomplete(json_root: Path = JSON_ROOT) -> Autocomplete:
+    index = Autocomplete.build(iter_json_laws(json_root))
+    index.save()
+    print(f"Autocomplétion : {COMPLETE_PATH.relative_to(BASE_DIR)} | {len(index.entries)} titres | "
+          f"{len(index.keys)} suffixes | {len(index.head)} préfixes précalculés")
+    return index
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--build":
+        build_autocomplete()
+    elif len(sys.argv) > 1:
+        # python src/autocomplete.py "<début de titre>" ... : temps par frappe
+        index = Autocomplete.load()
+        for prefix in sys.argv[1:]:
+            for length in range(1, len(prefix) + 1):
+                start = time.perf_counter()
+                results = index.complete(prefix[:length])
+                elapsed = (time.perf_counter() - start) * 1e6
+            print(f"{prefix} | {elapsed:.1f} µs (dernière frappe)")
+            for result in results:
+                where = "" if result["kind"] == "loi" else f"  ← {result['law_title']}"
+                print(f"   [{result['kind']}] {result['text']}{where}")
+    else:
+        print("Usage : python src/autocomplete.py --build | python src/autocomplete.py <préfixe>")
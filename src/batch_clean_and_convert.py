@@ -1,284 +1,1365 @@
-# src/batch_clean_and_convert.py
-import re
-import json
-from pathlib import Path
-from collections import Counter
-from typing import List, Dict, Any
-
-# === CONFIGURATION ===
-BASE_DIR = Path(__file__).parent.parent
-INPUT_ROOT = BASE_DIR / "text"
-CLEAN_ROOT = BASE_DIR / "cleaned_txt"
-JSON_ROOT = BASE_DIR / "json"
-
-CLEAN_ROOT.mkdir(parents=True, exist_ok=True)
-JSON_ROOT.mkdir(parents=True, exist_ok=True)
-
-# === MARQUEURS VISUELS ===
-MARKER_PATTERNS = {
-    'قسم': r'╔═══════ (.+?) ═══════╗',
-    'باب':  r'╠────── (.+?) ──────╣',
-    'فصل':  r'╟┄┄┄┄┄ (.+?) ┄┄┄┄┄╢',
-    'فرع':  r'╙⋅⋅⋅⋅⋅ (.+?) ⋅⋅⋅⋅⋅╜',
-    'مادة': r'╾───── (.+?) ─────╼',
-}
-
-LEVEL_ORDER = ['قسم', 'باب', 'فصل', 'فرع', 'مادة']
-LEVEL_TO_INDEX = {level: i for i, level in enumerate(LEVEL_ORDER)}
-
-def get_level(type_name: str) -> int:
-    return LEVEL_TO_INDEX.get(type_name, 999)
-
-def extract_number(title: str) -> int:
-    match = re.search(r'(أولى?|ثانية?|ثالثة?|رابعة?|خامسة?|سادسة?|سابعة?|ثامنة?|تاسعة?|عاشرة?|\d+)', title)
-    if not match:
-        return 999
-    num_text = match.group(0)
-    word_map = {
-        'أول': 1, 'أولى': 1, 'تمهيدي': 0,
-        'ثاني': 2, 'ثانية': 2,
-        'ثالث': 3, 'ثالثة': 3,
-        'رابع': 4, 'رابعة': 4,
-        'خامس': 5, 'خامسة': 5,
-        'سادس': 6, 'سادسة': 6,
-        'سابع': 7, 'سابعة': 7,
-        'ثامن': 8, 'ثامنة': 8,
-        'تاسع': 9, 'تاسعة': 9,
-        'عاشر': 10, 'عاشرة': 10,
-    }
-    return word_map.get(num_text, int(num_text) if num_text.isdigit() else 999)
-
-# === 1. NETTOYAGE (inchangé) ===
-def clean_legal_txt(input_path: Path, output_path: Path):
-    if not input_path.exists():
-        print(f"IGNORÉ : {input_path}")
-        return False
-
-    print(f"Nettoyage : {input_path.relative_to(BASE_DIR)}")
-    raw = input_path.read_text(encoding="utf-8", errors="ignore")
-
-    clean = re.sub(r'=== PAGE \d+ ===', '', raw)
-    clean = re.sub(r'-\s*\d+\s*-', '', clean)
-    clean = re.sub(r'^\s*[-.،]+\s*$\n?', '', clean, flags=re.MULTILINE)
-    clean = re.sub(r'^\s*$\n', '', clean, flags=re.MULTILINE)
-    clean = re.sub(r'([ا-ي٠-٩])\n([ا-ي])', r'\1 \2', clean)
-    clean = re.sub(r'([٠-٩])\n([ا-ي])', r'\1 \2', clean)
-
-    ocr_pattern = re.compile(r'\bا\s+ل([ا-ي])')
-    matches = ocr_pattern.findall(clean)
-    if matches:
-        starts = Counter(matches)
-        print(f"   OCR (ا ل) : {dict(starts.most_common(3))}")
-        for start in starts:
-            clean = re.sub(rf'\bا\s+ل{re.escape(start)}', f'ال{start}', clean)
-
-    ocr_fixes = [
-        (r'\bا\s+لقسم\b', 'القسم'), (r'\bا\s+لباب\b', 'الباب'),
-        (r'\bا\s+لفصل\b', 'الفصل'), (r'\bا\s+لفرع\b', 'الفرع'),
-        (r'\bا\s+لمادة\b', 'المادة'),
-    ]
-    for pat, rep in ocr_fixes:
-        clean = re.sub(pat, rep, clean, flags=re.IGNORECASE)
-
-    double_pattern = re.compile(r'\b(\w*?)([ا-ي])\2{2,}(\w*?)\b')
-    double_matches = double_pattern.findall(clean)
-    if double_matches:
-        fixes = {}
-        for prefix, letter, suffix in double_matches:
-            word = prefix + letter + suffix
-            corrected = prefix + letter + suffix
-            if word != corrected and word not in ['الله', 'الرحمن', 'الرحيم']:
-                fixes[word] = corrected
-        fixes = dict(sorted(fixes.items(), key=lambda x: -len(x[0])))
-        print(f"   Doublons : {len(fixes)} corrigés")
-        for bad, good in fixes.items():
-            clean = clean.replace(bad, good)
-
-    clean = clean.replace('\n', ' ')
-    clean = re.sub(r'[ \t]+', ' ', clean)
-    clean = re.sub(r'^\s+|\s+$', '', clean)
-
-    patterns = [
-        ('قسم', r'(القسم\s+(?:ال)?(?:أولى?|ثانية?|ثالثة?|رابعة?|خامسة?|سادسة?|سابعة?|ثامنة?|تاسعة?|عاشرة?|\d+)\s*[^\.؛]*?)(?=\s*(?:الباب|الفصل|المادة|$))'),
-        ('باب', r'(الباب\s+(?:ال)?(?:أول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|\d+)\s*[^\.؛]*?)(?=\s*(?:الفصل|الفرع|المادة|$))'),
-        ('فصل', r'(الفصل\s+(?:ال)?(?:أول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|\d+)\s*[^\.؛]*?)(?=\s*(?:الفرع|المادة|$))'),
-        ('فرع', r'(الفرع\s+(?:ال)?(?:أول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|\d+)\s*[^\.؛]*?)(?=\s*(?:المادة|$))'),
-        ('مادة', r'(المادة\s+(?:ال)?(?:أولى|ثانية|ثالثة|رابعة|خامسة|سادسة|سابعة|ثامنة|تاسعة|عاشرة|\d+(?:\s*مكرر(?:\s*\d*)?)?)\s*[^\.؛]*?)(?=\s*(?:المادة|$))'),
-    ]
-    sections = []
-    for sec_type, pattern in patterns:
-        regex = re.compile(pattern, re.IGNORECASE)
-        for match in regex.finditer(clean):
-            title = match.group(1).strip()
-            sections.append({'type': sec_type, 'title': title, 'start': match.start(), 'end': match.end()})
-    sections.sort(key=lambda x: x['start'])
-
-    result = []
-    last_end = 0
-    markers = {
-        'قسم': ('╔═══════', '═══════╗'),
-        'باب': ('╠──────', '──────╣'),
-        'فصل': ('╟┄┄┄┄┄', '┄┄┄┄┄╢'),
-        'فرع': ('╙⋅⋅⋅⋅⋅', '⋅⋅⋅⋅⋅╜'),
-        'مادة': ('╾─────', '─────╼'),
-    }
-    for i, sec in enumerate(sections):
-        content = clean[last_end:sec['start']].strip()
-        if content:
-            result.append(f"محتوى: {content}")
-            result.append("")
-        left, right = markers[sec['type']]
-        result.append(f"{left} {sec['title']} {right}")
-        if sec['type'] == 'مادة':
-            next_start = sections[i + 1]['start'] if i + 1 < len(sections) else len(clean)
-            mada_content = clean[sec['end']:next_start].strip()
-            if mada_content:
-                result.append(f"نص: {mada_content}")
-            result.append("")
-        result.append("")
-        last_end = sec['end']
-    final = clean[last_end:].strip()
-    if final:
-        result.append(f"محتوى: {final}")
-
-    clean_text = '\n'.join(result).strip()
-    clean_text = re.sub(r'\n{3,}', '\n\n', clean_text)
-    output_path.write_text(clean_text, encoding="utf-8")
-    print(f"Nettoyé : {output_path.relative_to(BASE_DIR)}")
-    return True
-
-# === 2. PARSING CORRIGÉ : CAPTURE `محتوى:` ET `نص:` ===
-def parse_cleaned_txt(input_path: Path) -> List[Dict[str, Any]]:
-    text = input_path.read_text(encoding="utf-8")
-    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
-
-    structure = []
-    stack = [structure]
-    current_section = None  # Dernière section détectée
-    i = 0
-
-    while i < len(lines):
-        line = lines[i]
-        matched = False
-
-        # === DÉTECTER MARQUEUR VISUEL ===
-        for level, pattern in MARKER_PATTERNS.items():
-            match = re.match(pattern, line)
-            if match:
-                title = match.group(1).strip()
-                num = extract_number(title)
-
-                node = {
-                    "type": level,
-                    "title": title,
-                    "number": num,
-                    "marker": line.strip(),
-                    "content": "",  # Sera rempli
-                    "children": []
-                }
-
-                # Ajuster la pile
-                while len(stack) > 1 and stack[-1] and get_level(stack[-1][-1]["type"]) >= get_level(level):
-                    stack.pop()
-
-                stack[-1].append(node)
-                if level != "مادة":
-                    stack.append(node["children"])
-                current_section = node
-                matched = True
-                i += 1
-                break
-
-        # === CAPTURER `محتوى:` OU `نص:` ===
-        if not matched and current_section is not None:
-            if line.startswith("محتوى:") or line.startswith("نص:"):
-                content_text = line.split(":", 1)[1].strip()
-                if current_section["content"]:
-                    current_section["content"] += " " + content_text
-                else:
-                    current_section["content"] = content_text
-            i += 1
-            continue
-
-        # === LIGNES SUPPLÉMENTAIRES (si pas de `محتوى:`) ===
-        if not matched and current_section is not None and current_section["type"] != "مادة":
-            if not line.startswith(("╔", "╠", "╟", "╙", "╾")):
-                if current_section["content"]:
-                    current_section["content"] += " " + line.strip()
-                else:
-                    current_section["content"] = line.strip()
-
-        i += 1
-
-    return structure
-
-# === 3. NETTOYAGE STRUCTURE ===
-def clean_structure(nodes: List[Dict]) -> List[Dict]:
-    result = []
-    for node in nodes:
-        content = node.get("content", "").strip()
-        if content or node.get("children"):
-            node["content"] = content
-            node["children"] = clean_structure(node["children"])
-            result.append(node)
-    return result
-
-# === 4. CONVERSION JSON ===
-def convert_to_json(clean_path: Path, json_path: Path):
-    print(f"Conversion JSON : {clean_path.relative_to(BASE_DIR)}")
-    text = clean_path.read_text(encoding="utf-8")
-    intro = ""
-    if '╔═══════' in text:
-        intro_part = text.split('╔═══════', 1)[0]
-        intro = re.sub(r'^محتوى:\s*', '', intro_part)
-        intro = re.sub(r'\s+', ' ', intro).strip()
-
-    structure = clean_structure(parse_cleaned_txt(clean_path))
-
-    law = {
-        "title": clean_path.stem.replace("_clean", "").replace("-", " "),
-        "type": "قانون تنظيمي",
-        "intro": intro,
-        "structure": structure,
-        "source_path": str(clean_path.relative_to(BASE_DIR))
-    }
-
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(law, f, ensure_ascii=False, indent=2)
-
-    def count(n, t=None): 
-        return sum(1 for x in n if (t is None or x["type"] == t)) + sum(count(x.get("children", []), t) for x in n)
-    
-    m = count(structure, "مادة")
-    q = count(structure, "قسم")
-    b = count(structure, "باب")
-    f = count(structure, "فصل")
-    print(f"JSON généré : {json_path.relative_to(BASE_DIR)} | {q} قسم | {b} باب | {f} فصل | {m} مادة")
-
-# === 5. TRAITEMENT RÉCURSIF ===
-def process_all_files():
-    txt_files = sorted([f for f in INPUT_ROOT.rglob("*.txt") if f.is_file()])
-    print(f"{len(txt_files)} fichiers .txt trouvés dans {INPUT_ROOT} (et sous-dossiers)\n")
-
-    for txt_file in txt_files:
-        rel_path = txt_file.relative_to(INPUT_ROOT)
-        clean_file = CLEAN_ROOT / rel_path.parent / (rel_path.stem + "_clean.txt")
-        json_file = JSON_ROOT / rel_path.parent / (rel_path.stem + ".json")
-
-        clean_file.parent.mkdir(parents=True, exist_ok=True)
-        json_file.parent.mkdir(parents=True, exist_ok=True)
-
-        print(f"\nTRAITEMENT : {txt_file.relative_to(BASE_DIR)}")
-        print("-" * 60)
-
-        if clean_legal_txt(txt_file, clean_file):
-            convert_to_json(clean_file, json_file)
-        else:
-            print(f"ÉCHEC : {txt_file.name}")
-
-    print(f"\nTOUS LES FICHIERS TRAITÉS !")
-    print(f"Nettoyés → {CLEAN_ROOT}")
-    print(f"JSON → {JSON_ROOT}")
-
-if __name__ == "__main__":
-    process_all_files()
\ No newline at end of file
+# src/batch_clean_and_convert.py
+import io
+import os
+import re
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from time import perf_counter
+from contextlib import redirect_stdout
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from metrics import FileMetrics, MetricsWriter
+
+# === CONFIGURATION ===
+BASE_DIR = Path(__file__).parent.parent
+INPUT_ROOT = BASE_DIR / "text"
+CLEAN_ROOT = BASE_DIR / "cleaned_txt"
+JSON_ROOT = BASE_DIR / "json"
+MANIFEST_PATH = BASE_DIR / "manifest.json"
+# Manifestes des builds répartis (src/sharded_build.py)
+SHARDS_DIR = BASE_DIR / "shards"
+# Dictionnaire de corrections OCR appris sur le corpus (src/ocr_dictionary.py)
+CORRECTIONS_PATH = BASE_DIR / "ocr_corrections.json"
+
+# Incrémenter à chaque changement des règles de nettoyage ou de parsing :
+# toutes les entrées du manifeste deviennent alors obsolètes.
+PIPELINE_VERSION = 6
+
+CLEAN_ROOT.mkdir(parents=True, exist_ok=True)
+JSON_ROOT.mkdir(parents=True, exist_ok=True)
+
+# === MARQUEURS VISUELS ===
+MARKER_PATTERNS = {
+    'قسم': r'╔═══════ (.+?) ═══════╗',
+    'باب':  r'╠────── (.+?) ──────╣',
+    'فصل':  r'╟┄┄┄┄┄ (.+?) ┄┄┄┄┄╢',
+    'فرع':  r'╙⋅⋅⋅⋅⋅ (.+?) ⋅⋅⋅⋅⋅╜',
+    'مادة': r'╾───── (.+?) ─────╼',
+}
+
+LEVEL_ORDER = ['قسم', 'باب', 'فصل', 'فرع', 'مادة']
+LEVEL_TO_INDEX = {level: i for i, level in enumerate(LEVEL_ORDER)}
+
+def get_level(type_name: str) -> int:
+    return LEVEL_TO_INDEX.get(type_name, 999)
+
+def extract_number(title: str) -> int:
+    match = re.search(r'(أولى?|ثانية?|ثالثة?|رابعة?|خامسة?|سادسة?|سابعة?|ثامنة?|تاسعة?|عاشرة?|\d+)', title)
+    if not match:
+        return 999
+    num_text = match.group(0)
+    word_map = {
+        'أول': 1, 'أولى': 1, 'تمهيدي': 0,
+        'ثاني': 2, 'ثانية': 2,
+        'ثالث': 3, 'ثالثة': 3,
+        'رابع': 4, 'رابعة': 4,
+        'خامس': 5, 'خامسة': 5,
+        'سادس': 6, 'سادسة': 6,
+        'سابع': 7, 'سابعة': 7,
+        'ثامن': 8, 'ثامنة': 8,
+        'تاسع': 9, 'تاسعة': 9,
+        'عاشر': 10, 'عاشرة': 10,
+    }
+    return word_map.get(num_text, int(num_text) if num_text.isdigit() else 999)
+
+# === 0. MOTEUR DE NORMALISATION (règles compilées une seule fois) ===
+# Chaque règle remplace une ou plusieurs anciennes passes `re.sub` ; le texte
+# produit est identique octet pour octet à l'ancienne chaîne de substitutions.
+PAGE_MARKER_RE = re.compile(r'=== PAGE \d+ ===')
+PAGE_NUMBER_RE = re.compile(r'-\s*\d+\s*-')
+# Lignes de ponctuation seule (-, ., ،) et lignes vides en une seule passe
+EMPTY_LINE_RE = re.compile(r'^\s*(?:[-.،]+\s*$\n?|$\n)', re.MULTILINE)
+# "ا ل" + lettre → "ال" + lettre, toutes lettres confondues (couvre aussi
+# القسم/الباب/الفصل/الفرع/المادة)
+OCR_AL_RE = re.compile(r'\bا\s+ل([ا-ي])')
+# Lettre répétée au moins trois fois (étirement OCR : "المممادة") et mot
+# entier qui la contient
+LETTER_RUN_RE = re.compile(r'([ا-ي])\1{2,}')
+DOUBLE_LETTER_RE = re.compile(r'\b\w*?([ا-ي])\1{2,}\w*')
+DOUBLE_LETTER_KEEP = {'الله', 'الرحمن', 'الرحيم'}
+MULTI_SPACE_RE = re.compile(r' {2,}')
+# Sauts de ligne et tabulations → espace (les mots cassés par un saut de
+# ligne sont ainsi recollés sans passe dédiée) : deux str.replace, bien plus
+# rapides qu'un str.translate avec table. Tatweel et formes de présentation
+# ne sont pas repliés ici : le texte nettoyé reste fidèle à la source, comme
+# les lois fournies en .json auxquelles les copies converties sont comparées ;
+# la recherche et l'autocomplétion replient le tatweel (normalize_arabic).
+def spaces_for_breaks(text: str) -> str:
+    return text.replace('\n', ' ').replace('\t', ' ')
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """Regex équivalente à l'alternance des mots, factorisée selon leur
+    trie : les préfixes communs ne sont testés qu'une fois."""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Quantificateur glouton : le mot le plus long est essayé d'abord
+            return (group if len(branches) == 1 and len(branches[0]) == 1 else f"(?:{group})") + "?"
+        return group
+
+    return build(trie)
+
+class MultiReplacer:
+    """Applique une table {motif: remplacement} en une seule passe sur le
+    texte. Avec `whole_words`, seuls les mots entiers sont remplacés."""
+
+    def __init__(self, table: Dict[str, str], whole_words: bool = True):
+        self.table = {k: v for k, v in table.items() if k and k != v}
+        self.digest = None
+        self.regex = None
+        if self.table:
+            self.digest = hashlib.sha1(json.dumps(self.table, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+            pattern = trie_pattern(self.table)
+            self.regex = re.compile(rf'(?<!\w)(?:{pattern})(?!\w)' if whole_words else pattern)
+
+    def __len__(self):
+        return len(self.table)
+
+    def sub(self, text: str):
+        """Retourne (texte corrigé, compteur des motifs remplacés)."""
+        counts = Counter()
+        if self.regex is None:
+            return text, counts
+        def replace(match):
+            counts[match.group(0)] += 1
+            return self.table[match.group(0)]
+        return self.regex.sub(replace, text), counts
+
+def load_corrections(path: Path = CORRECTIONS_PATH) -> Dict[str, str]:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["corrections"]
+
+CORRECTIONS = MultiReplacer(load_corrections())
+
+def find_double_letter_fixes(text: str, known: Optional[Dict[str, str]] = None):
+    """Retourne None si aucune lettre triplée n'est détectée, sinon le
+    dictionnaire {mot fautif: correction}. Une répétition n'est corrigée que
+    si le dictionnaire OCR appris (`known`, par défaut ocr_corrections.json)
+    donne la forme du mot : ocr_dictionary.py ne retient qu'une forme attestée
+    dans le corpus ("بتعييين" → "بتعيين" et non "بتعين"). Sans dictionnaire,
+    le texte reste inchangé."""
+    known = CORRECTIONS.table if known is None else known
+    # Recherche sans contexte de mot d'abord : la plupart des textes n'ont
+    # aucune répétition et s'arrêtent là
+    if not LETTER_RUN_RE.search(text):
+        return None
+    fixes = {}
+    if known:
+        for match in DOUBLE_LETTER_RE.finditer(text):
+            word = match.group(0)
+            if word in known and word not in DOUBLE_LETTER_KEEP:
+                fixes[word] = known[word]
+    return fixes
+
+# Étapes de la normalisation, séparées pour pouvoir être mesurées une à une
+def strip_layout(raw: str) -> str:
+    clean = PAGE_MARKER_RE.sub('', raw)
+    clean = PAGE_NUMBER_RE.sub('', clean)
+    return EMPTY_LINE_RE.sub('', clean)
+
+def fix_ocr_al(clean: str):
+    ocr_starts = Counter()
+    def fix_al(match):
+        ocr_starts[match.group(1)] += 1
+        return 'ال' + match.group(1)
+    return OCR_AL_RE.sub(fix_al, clean), ocr_starts
+
+def fix_double_letters(clean: str):
+    double_fixes = find_double_letter_fixes(clean)
+    if double_fixes:
+        clean = MultiReplacer(double_fixes, whole_words=False).sub(clean)[0]
+    return clean, double_fixes
+
+def collapse_whitespace(clean: str) -> str:
+    return MULTI_SPACE_RE.sub(' ', spaces_for_breaks(clean)).strip()
+
+def fix_dictionary(clean: str):
+    return CORRECTIONS.sub(clean)
+
+def normalize_text(raw: str):
+    """Normalise le texte OCR brut. Retourne (texte, compteur des corrections
+    "ا ل" par lettre, corrections de doublons ou None, compteur des
+    corrections du dictionnaire OCR)."""
+    clean, ocr_starts = fix_ocr_al(strip_layout(raw))
+    clean, double_fixes = fix_double_letters(clean)
+    clean, corrections = fix_dictionary(collapse_whitespace(clean))
+    return clean, ocr_starts, double_fixes, corrections
+
+# === 0 bis. DÉTECTION DES SECTIONS (une seule passe, temps linéaire) ===
+# Équivalent exact des cinq anciennes regex `TITRE\s+NUMÉRO\s*[^\.؛]*?(?=\s*(?:TERMINATEUR|$))` :
+# un titre commence à son mot-clé, s'étend jusqu'au premier mot-clé terminateur
+# (espaces précédents exclus) ou la fin du texte, et est rejeté si un `.` ou un
+# `؛` apparaît avant. Au lieu de rebalayer le texte pour chaque occurrence, on
+# relève une fois les mots-clés et la ponctuation, puis on avance des pointeurs.
+HEADING_KEYWORDS = {'القسم': 'قسم', 'الباب': 'باب', 'الفصل': 'فصل', 'الفرع': 'فرع', 'المادة': 'مادة'}
+HEADING_RE = re.compile('|'.join(HEADING_KEYWORDS))
+TITLE_STOP_RE = re.compile(r'[\.؛]')
+
+_ORD_F = r'(?:أولى?|ثانية?|ثالثة?|رابعة?|خامسة?|سادسة?|سابعة?|ثامنة?|تاسعة?|عاشرة?|\d+)'
+_ORD_M = r'(?:أول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|\d+)'
+_ORD_MADA = r'(?:أولى|ثانية|ثالثة|رابعة|خامسة|سادسة|سابعة|ثامنة|تاسعة|عاشرة|\d+(?:\s*مكرر(?:\s*\d*)?)?)'
+SECTION_HEADERS = {
+    'قسم': re.compile(r'القسم\s+(?:ال)?' + _ORD_F + r'\s*'),
+    'باب': re.compile(r'الباب\s+(?:ال)?' + _ORD_M + r'\s*'),
+    'فصل': re.compile(r'الفصل\s+(?:ال)?' + _ORD_M + r'\s*'),
+    'فرع': re.compile(r'الفرع\s+(?:ال)?' + _ORD_M + r'\s*'),
+    'مادة': re.compile(r'المادة\s+(?:ال)?' + _ORD_MADA + r'\s*'),
+}
+SECTION_TERMINATORS = {
+    'قسم': ('باب', 'فصل', 'مادة'),
+    'باب': ('فصل', 'فرع', 'مادة'),
+    'فصل': ('فرع', 'مادة'),
+    'فرع': ('مادة',),
+    'مادة': ('مادة',),
+}
+
+def detect_sections(clean: str) -> List[Dict[str, Any]]:
+    """Sections dans l'ordre du document : [{'type', 'title', 'start', 'end'}]."""
+    keywords = [(m.start(), HEADING_KEYWORDS[m.group(0)]) for m in HEADING_RE.finditer(clean)]
+    stops = [m.start() for m in TITLE_STOP_RE.finditer(clean)]
+    terminators = {
+        sec_type: [pos for pos, kw in keywords if kw in ends]
+        for sec_type, ends in SECTION_TERMINATORS.items()
+    }
+    # Les débuts de corps de titre sont croissants : chaque pointeur ne recule jamais
+    term_ptr = dict.fromkeys(SECTION_TERMINATORS, 0)
+    last_end = dict.fromkeys(SECTION_TERMINATORS, 0)
+    stop_ptr = 0
+
+    sections = []
+    for start, sec_type in keywords:
+        if start < last_end[sec_type]:
+            continue  # à l'intérieur du titre précédent du même type
+        header = SECTION_HEADERS[sec_type].match(clean, start)
+        if not header:
+            continue
+        body_start = header.end()
+
+        positions = terminators[sec_type]
+        p = term_ptr[sec_type]
+        while p < len(positions) and positions[p] < body_start:
+            p += 1
+        term_ptr[sec_type] = p
+        end = positions[p] if p < len(positions) else len(clean)
+        while end > body_start and clean[end - 1].isspace():
+            end -= 1
+
+        while stop_ptr < len(stops) and stops[stop_ptr] < body_start:
+            stop_ptr += 1
+        if stop_ptr < len(stops) and stops[stop_ptr] < end:
+            continue
+
+        sections.append({'type': sec_type, 'title': clean[start:end].strip(), 'start': start, 'end': end})
+        last_end[sec_type] = end
+    return sections
+
+# === 1. NETTOYAGE ===
+SECTION_MARKERS = {
+    'قسم': ('╔═══════', '═══════╗'),
+    'باب': ('╠──────', '──────╣'),
+    'فصل': ('╟┄┄┄┄┄', '┄┄┄┄┄╢'),
+    'فرع': ('╙⋅⋅⋅⋅⋅', '⋅⋅⋅⋅⋅╜'),
+    'مادة': ('╾─────', '─────╼'),
+}
+
+def section_records(clean: str, sections: List[Dict[str, Any]]) -> List[tuple]:
+    """Suite d'enregistrements équivalente aux lignes du fichier nettoyé :
+    ("section", type, titre, marqueur), ("محتوى", texte) ou ("نص", texte)."""
+    records = []
+    last_end = 0
+    for i, sec in enumerate(sections):
+        content = clean[last_end:sec['start']].strip()
+        if content:
+            records.append(("محتوى", content))
+        left, right = SECTION_MARKERS[sec['type']]
+        records.append(("section", sec['type'], sec['title'], f"{left} {sec['title']} {right}"))
+        if sec['type'] == 'مادة':
+            next_start = sections[i + 1]['start'] if i + 1 < len(sections) else len(clean)
+            mada_content = clean[sec['end']:next_start].strip()
+            if mada_content:
+                records.append(("نص", mada_content))
+        last_end = sec['end']
+    final = clean[last_end:].strip()
+    if final:
+        records.append(("محتوى", final))
+    return records
+
+def record_line(record: tuple) -> str:
+    return record[3] if record[0] == "section" else f"{record[0]}: {record[1]}"
+
+def render_cleaned_txt(records: List[tuple]) -> str:
+    # Une ligne vide entre deux lignes, sauf entre un marqueur مادة et son نص
+    parts = []
+    for record in records:
+        if parts:
+            parts.append("\n" if record[0] == "نص" else "\n\n")
+        parts.append(record_line(record))
+    return "".join(parts)
+
+def clean_to_records(input_path: Path, metrics: Optional[FileMetrics] = None):
+    """Nettoie un fichier brut. Retourne (texte normalisé, enregistrements) ou None."""
+    metrics = metrics or FileMetrics(str(input_path))
+    if not input_path.exists():
+        print(f"IGNORÉ : {input_path}")
+        return None
+
+    print(f"Nettoyage : {input_path.relative_to(BASE_DIR)}")
+    with metrics.stage("lecture"):
+        raw = input_path.read_text(encoding="utf-8", errors="ignore")
+    metrics.add("bytes_in", input_path.stat().st_size)
+
+    with metrics.stage("normalisation"):
+        clean, ocr_starts, double_fixes, corrections = normalize_text(raw)
+    metrics.add("ocr_fixes", sum(ocr_starts.values()))
+    metrics.add("double_fixes", len(double_fixes or ()))
+    metrics.add("dictionary_fixes", sum(corrections.values()))
+    if ocr_starts:
+        print(f"   OCR (ا ل) : {dict(ocr_starts.most_common(3))}")
+    if double_fixes is not None:
+        print(f"   Doublons : {len(double_fixes)} corrigés")
+    if corrections:
+        print(f"   Dictionnaire OCR : {sum(corrections.values())} corrections ({len(corrections)} mots)")
+
+    with metrics.stage("sections"):
+        records = section_records(clean, detect_sections(clean))
+    return clean, records
+
+def write_cleaned_txt(output_path: Path, text: str, metrics: FileMetrics):
+    with metrics.stage("écriture"):
+        output_path.write_text(text, encoding="utf-8")
+    metrics.add("bytes_out", output_path.stat().st_size)
+    print(f"Nettoyé : {output_path.relative_to(BASE_DIR)}")
+
+def clean_legal_txt(input_path: Path, output_path: Path, metrics: Optional[FileMetrics] = None):
+    metrics = metrics or FileMetrics(str(input_path))
+    cleaned = clean_to_records(input_path, metrics)
+    if cleaned is None:
+        return False
+    with metrics.stage("rendu"):
+        text = render_cleaned_txt(cleaned[1])
+    write_cleaned_txt(output_path, text, metrics)
+    return True
+
+# === 1 bis. NETTOYAGE EN FLUX (MÉMOIRE BORNÉE) ===
+# Pour les très gros fichiers : le texte brut est lu par fenêtres et le
+# fichier nettoyé écrit au fur et à mesure, octet pour octet identique au
+# nettoyage en un bloc. Deux coupures sûres :
+# - texte brut : juste après un saut de ligne encadré de caractères qui ne
+#   sont ni blancs, ni chiffres, ni `-.،` (et pas `ا` avant) : aucune règle
+#   de normalisation ne peut chevaucher la coupure ;
+# - texte normalisé : au début d'une مادة acceptée suivie d'un autre mot-clé
+#   المادة. مادة termine les titres de tous les niveaux, donc aucune section
+#   antérieure ne dépasse la coupure et celle-ci ne dépend plus de la suite.
+STREAM_WINDOW = 1 << 20  # caractères lus à chaque fenêtre
+STREAM_THRESHOLD = 16 * 1024 * 1024  # octets : au-delà, process_file passe en flux
+RAW_CUT_UNSAFE = set('-.،')
+
+def safe_raw_cut(text: str) -> int:
+    """Position (après un saut de ligne) jusqu'à laquelle `text` peut être
+    normalisé seul ; 0 si aucune."""
+    p = text.rfind('\n', 0, len(text) - 1)
+    while p > 0:
+        before, after = text[p - 1], text[p + 1]
+        if not (before.isspace() or before.isdecimal() or before in RAW_CUT_UNSAFE or before == 'ا'
+                or after.isspace() or after.isdecimal() or after in RAW_CUT_UNSAFE):
+            return p + 1
+        p = text.rfind('\n', 0, p)
+    return 0
+
+class StreamingNormalizer:
+    """normalize_text appliqué morceau par morceau (morceaux coupés par
+    safe_raw_cut). Les blancs de fin sont retenus jusqu'au morceau suivant
+    pour reproduire la fusion des espaces et le strip() final."""
+
+    def __init__(self):
+        self.ocr_starts = Counter()
+        self.double_fixes = None
+        self.corrections = Counter()
+        self._tail = ""
+        self._started = False
+
+    def feed(self, raw: str) -> str:
+        clean, ocr_starts = fix_ocr_al(strip_layout(raw))
+        self.ocr_starts.update(ocr_starts)
+        clean, double_fixes = fix_double_letters(clean)
+        if double_fixes is not None:
+            self.double_fixes = {**(self.double_fixes or {}), **double_fixes}
+        clean, corrections = fix_dictionary(clean)
+        self.corrections.update(corrections)
+        clean = MULTI_SPACE_RE.sub(' ', self._tail + spaces_for_breaks(clean))
+        if not self._started:
+            clean = clean.lstrip()
+            self._started = bool(clean)
+        body = clean.rstrip()
+        self._tail = clean[len(body):]
+        return body
+
+class StreamingSections:
+    """Détection des sections et rendu du fichier nettoyé par fenêtres : seul
+    le texte depuis la dernière coupure sûre reste en mémoire."""
+
+    def __init__(self, out, window: int = STREAM_WINDOW):
+        self.out = out
+        self.window = window
+        self.buffer = ""
+        self.next_attempt = window
+        self.started = False
+        self.sections = 0
+
+    def write(self, records: List[tuple]):
+        parts = []
+        for record in records:
+            if self.started:
+                parts.append("\n" if record[0] == "نص" else "\n\n")
+            parts.append(record_line(record))
+            self.started = True
+        self.out.write("".join(parts))
+
+    def feed(self, clean: str):
+        self.buffer += clean
+        if len(self.buffer) < self.next_attempt:
+            return
+        sections = detect_sections(self.buffer)
+        last_keyword = self.buffer.rfind('المادة')
+        cut = 0
+        for sec in reversed(sections):
+            if sec['type'] == 'مادة' and 0 < sec['start'] < last_keyword:
+                cut = sec['start']
+                break
+        if cut:
+            before = [sec for sec in sections if sec['start'] < cut]
+            self.sections += len(before)
+            self.write(section_records(self.buffer[:cut], before))
+            self.buffer = self.buffer[cut:]
+            self.next_attempt = len(self.buffer) + self.window
+        else:
+            # Pas de coupure sûre : on attend d'avoir doublé le tampon (coût linéaire)
+            self.next_attempt = 2 * len(self.buffer)
+
+    def close(self):
+        sections = detect_sections(self.buffer)
+        self.sections += len(sections)
+        self.write(section_records(self.buffer, sections))
+        self.buffer = ""
+
+def clean_legal_txt_streaming(input_path: Path, output_path: Path, window: int = STREAM_WINDOW,
+                              metrics: Optional[FileMetrics] = None) -> bool:
+    """Même sortie que clean_legal_txt, avec une mémoire de l'ordre de la
+    fenêtre et de la plus longue مادة plutôt que de la taille du fichier."""
+    metrics = metrics or FileMetrics(str(input_path))
+    if not input_path.exists():
+        print(f"IGNORÉ : {input_path}")
+        return False
+
+    print(f"Nettoyage (flux) : {input_path.relative_to(BASE_DIR)}")
+    normalizer = StreamingNormalizer()
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    with metrics.stage("nettoyage_flux"):
+        with open(input_path, encoding="utf-8", errors="ignore") as src, \
+                open(tmp_path, "w", encoding="utf-8") as out:
+            sections = StreamingSections(out, window)
+            carry = ""
+            while True:
+                chunk = src.read(window)
+                data = carry + chunk
+                if not chunk:
+                    sections.feed(normalizer.feed(data))
+                    break
+                cut = safe_raw_cut(data)
+                if cut:
+                    sections.feed(normalizer.feed(data[:cut]))
+                    data = data[cut:]
+                carry = data
+            sections.close()
+    tmp_path.replace(output_path)
+    metrics.add("bytes_in", input_path.stat().st_size)
+    metrics.add("bytes_out", output_path.stat().st_size)
+    metrics.add("ocr_fixes", sum(normalizer.ocr_starts.values()))
+    metrics.add("double_fixes", len(normalizer.double_fixes or ()))
+    metrics.add("dictionary_fixes", sum(normalizer.corrections.values()))
+
+    if normalizer.ocr_starts:
+        print(f"   OCR (ا ل) : {dict(normalizer.ocr_starts.most_common(3))}")
+    if normalizer.double_fixes is not None:
+        print(f"   Doublons : {len(normalizer.double_fixes)} corrigés")
+    if normalizer.corrections:
+        print(f"   Dictionnaire OCR : {sum(normalizer.corrections.values())} corrections ({len(normalizer.corrections)} mots)")
+    print(f"Nettoyé : {output_path.relative_to(BASE_DIR)}")
+    return True
+
+# === 2. PARSING CORRIGÉ : CAPTURE `محتوى:` ET `نص:` ===
+MARKER_RES = {level: re.compile(pattern) for level, pattern in MARKER_PATTERNS.items()}
+# Chaque marqueur commence par un caractère distinct : une seule regex à tester
+MARKER_BY_CHAR = {left[0]: level for level, (left, _) in SECTION_MARKERS.items()}
+
+def cleaned_txt_records(lines: Iterable[str]) -> Iterator[tuple]:
+    """Relit un fichier nettoyé (liste de lignes ou fichier ouvert) : un
+    enregistrement par ligne non vide."""
+    for chunk in lines:
+        for line in chunk.splitlines():
+            if not line.strip():
+                continue
+            line = line.rstrip()
+            level = MARKER_BY_CHAR.get(line[0])
+            match = MARKER_RES[level].match(line) if level else None
+            if match:
+                yield ("section", level, match.group(1).strip(), line.strip())
+            elif line.startswith("محتوى:") or line.startswith("نص:"):
+                label, content_text = line.split(":", 1)
+                yield (label, content_text.strip())
+            else:
+                yield ("ligne", line)
+
+def iter_events(records: Iterable[tuple]) -> Iterator[tuple]:
+    """Transforme les enregistrements en événements imbriqués :
+    ("start", {type, title, number, marker}), ("content", texte), ("end", nœud).
+    Seule la pile des sections ouvertes est gardée en mémoire."""
+    # Pile de [nœud, type du dernier enfant] ; la racine n'a pas de nœud
+    stack = [[None, None]]
+    open_leaf = None  # مادة en cours : fermée à la section suivante
+    started = False
+    skip_next = False
+
+    for record in records:
+        # Comportement historique conservé : la ligne qui suit un marqueur
+        # (souvent le `نص:` d'une مادة) n'est pas lue.
+        if skip_next:
+            skip_next = False
+            continue
+
+        if record[0] == "section":
+            _, level, title, marker = record
+            if open_leaf is not None:
+                yield ("end", open_leaf)
+                open_leaf = None
+
+            # Ajuster la pile
+            while len(stack) > 1 and stack[-1][1] is not None and get_level(stack[-1][1]) >= get_level(level):
+                yield ("end", stack.pop()[0])
+
+            node = {"type": level, "title": title, "number": extract_number(title), "marker": marker}
+            stack[-1][1] = level
+            yield ("start", node)
+            if level != "مادة":
+                stack.append([node, None])
+            else:
+                open_leaf = node
+            started = True
+            skip_next = True
+
+        elif started and record[0] != "ligne":
+            yield ("content", record[1])
+
+    if open_leaf is not None:
+        yield ("end", open_leaf)
+    while len(stack) > 1:
+        yield ("end", stack.pop()[0])
+
+def stream_cleaned_txt(input_path: Path) -> Iterator[tuple]:
+    """Événements d'un fichier nettoyé, lu ligne à ligne (mémoire constante)."""
+    with open(input_path, encoding="utf-8") as f:
+        yield from iter_events(cleaned_txt_records(f))
+
+def build_tree(events: Iterable[tuple]) -> List[Dict[str, Any]]:
+    structure = []
+    stack = [structure]
+    nodes = []
+    for kind, value in events:
+        if kind == "start":
+            node = dict(value, content="", children=[])
+            stack[-1].append(node)
+            stack.append(node["children"])
+            nodes.append(node)
+        elif kind == "content":
+            node = nodes[-1]
+            if node["content"]:
+                node["content"] += " " + value
+            else:
+                node["content"] = value
+        else:
+            stack.pop()
+            nodes.pop()
+    return structure
+
+def build_structure(records: Iterable[tuple]) -> List[Dict[str, Any]]:
+    return build_tree(iter_events(records))
+
+def parse_cleaned_txt(input_path: Path) -> List[Dict[str, Any]]:
+    return build_tree(stream_cleaned_txt(input_path))
+
+# === 3. NETTOYAGE STRUCTURE ===
+def clean_structure(nodes: List[Dict]) -> List[Dict]:
+    result = []
+    for node in nodes:
+        content = node.get("content", "").strip()
+        if content or node.get("children"):
+            node["content"] = content
+            node["children"] = clean_structure(node["children"])
+            result.append(node)
+    return result
+
+# === 3 bis. RENVOIS ENTRE ARTICLES ===
+# Les renvois ("المادة 12 أعلاه", "المادتين 62 و80", "الفصل 113 من الدستور",
+# "المادة 82 من القانون التنظيمي رقم 111.14") sont relevés à la conversion et
+# rangés dans le JSON de la loi ; cross_refs.py les résout ensuite en
+# identifiants de nœuds pour tout le corpus. Le texte est d'abord replié
+# (hamzas, ligature lam-alif inversée) pour que "األولى" et "الأولى" se
+# lisent de la même façon.
+REF_FOLD_TABLE = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ـ': None})
+REF_ORDINALS = {
+    'اول': 1, 'اولى': 1, 'فريدة': 1, 'وحيدة': 1,
+    'ثاني': 2, 'ثانية': 2, 'ثالث': 3, 'ثالثة': 3, 'رابع': 4, 'رابعة': 4,
+    'خامس': 5, 'خامسة': 5, 'سادس': 6, 'سادسة': 6, 'سابع': 7, 'سابعة': 7,
+    'ثامن': 8, 'ثامنة': 8, 'تاسع': 9, 'تاسعة': 9, 'عاشر': 10, 'عاشرة': 10,
+}
+_REF_NUM = r'(?:\d+|(?:ال)?(?:' + '|'.join(sorted(REF_ORDINALS, key=len, reverse=True)) + r')\b)'
+REF_NUM_RE = re.compile(r'(الى|-)?\s*(?:و\s*)?(\d+|(?:ال)?(' + '|'.join(REF_ORDINALS) + r'))')
+REF_KEYWORDS = {'مادة': 'مادة', 'مادتين': 'مادة', 'مادتان': 'مادة', 'مواد': 'مادة',
+                'فصل': 'فصل', 'فصلين': 'فصل', 'فصلان': 'فصل', 'فصول': 'فصل'}
+REF_RE = re.compile(
+    r'(?:ال|لل)(' + '|'.join(sorted(REF_KEYWORDS, key=len, reverse=True)) + r')\s*(?:من\s*)?'
+    r'(' + _REF_NUM + r'(?:\s*(?:[،,]|و|الى|-)\s*(?:و\s*)?' + _REF_NUM + r')*)'
+)
+# Cible du renvoi, cherchée juste après les numéros (avant la fin de phrase)
+REF_LAW_RE = re.compile(r'(?:القانون|الظهير|المرسوم)[^.؛]{0,60}?رقم\s*(\d+(?:[.\-]\d+)+)')
+REF_SENTENCE_END_RE = re.compile(r'\.(?!\d)|؛')
+REF_SELF_RE = re.compile(r'^\W*(?:من\s*)?(?:هذا|هذه)\b')
+REF_EXTERNAL_RE = re.compile(r'^\W*من\s*(?:ال)?(?:قانون|ظهير|مرسوم|مدونة|نظام|اتفاقية)')
+# Le parseur laisse beaucoup d'intitulés d'articles dans le contenu du nœud
+# précédent ("... المجلس. المادة124 يتم"). Sans cible explicite, une mention
+# n'est donc un renvoi que si elle est qualifiée ("أعلاه", "منه"...) ou
+# introduite par un mot de renvoi ("طبقا لأحكام المادة 9").
+REF_QUALIFIER_RE = re.compile(r'^\W*(?:من\s*)?(?:اعلاه|اعاله|ادناه|منه|هذا|هذه|السالف|المذكور|بعده|قبله)')
+REF_CUES = {'في', 'من', 'الى', 'على', 'عليه', 'عليها', 'اليه', 'اليها', 'بها', 'به', 'انظر', 'السيما',
+            'احكام', 'الحكام', 'مقتضيات', 'بمقتضى', 'بموجب', 'طبقا', 'وفق', 'وفقا', 'حسب', 'تطبيقا',
+            'شان', 'يخص', 'نسخ', 'تغيير', 'تتميم', 'تعويض', 'بمثابة'}
+REF_CUE_PREFIXES = ('و', 'ف', 'ب', 'ل')
+REF_WINDOW = 120
+REF_MAX_RANGE = 50
+CONSTITUTION = "الدستور"
+
+def fold_reference_text(text: str) -> str:
+    return text.translate(REF_FOLD_TABLE).replace('اال', 'الا')
+
+def reference_numbers(numbers: str) -> List[int]:
+    """"62 و80" → [62, 80] ; "من 62 الى 64" → [62, 63, 64]."""
+    result = []
+    for match in REF_NUM_RE.finditer(numbers):
+        sep, digits, ordinal = match.groups()
+        value = REF_ORDINALS[ordinal] if ordinal else int(digits)
+        if sep and result and 0 < value - result[-1] <= REF_MAX_RANGE:
+            result.extend(range(result[-1] + 1, value + 1))
+        else:
+            result.append(value)
+    return result
+
+def reference_target(tail: str) -> Optional[str]:
+    """None pour la loi elle-même, CONSTITUTION, le numéro d'une autre loi
+    ("111.14"), ou "" pour un texte extérieur non identifiable."""
+    tail = REF_SENTENCE_END_RE.split(tail, 1)[0]
+    match = REF_LAW_RE.search(tail)
+    if match:
+        return match.group(1).replace('-', '.')
+    if CONSTITUTION in tail:
+        return CONSTITUTION
+    if REF_SELF_RE.match(tail) or not REF_EXTERNAL_RE.match(tail):
+        return None
+    return ""
+
+def is_cue(word: str) -> bool:
+    word = word.strip('.,،:()"«»-')
+    return word in REF_CUES or (word[:1] in REF_CUE_PREFIXES and word[1:] in REF_CUES)
+
+def scan_references(text: str) -> Iterator[tuple]:
+    """(type, numéros, cible, renvoi ?) pour chaque mention d'article ou de
+    فصل ; `renvoi` est faux pour un intitulé resté dans le contenu."""
+    text = fold_reference_text(text)
+    matches = list(REF_RE.finditer(text))
+    for i, match in enumerate(matches):
+        if match.start() == 0:
+            continue  # intitulé du nœud lui-même
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        tail = text[match.end():min(end, match.end() + REF_WINDOW)]
+        target = reference_target(tail)
+        if target == "":
+            continue
+        previous = text[max(0, match.start() - 30):match.start()].split()
+        cited = (target is not None or match.group(0).startswith('لل') or REF_QUALIFIER_RE.match(tail) is not None
+                 or (bool(previous) and is_cue(previous[-1])))
+        yield REF_KEYWORDS[match.group(1)], reference_numbers(match.group(2)), target, cited
+
+def node_references(text: str) -> List[Dict[str, Any]]:
+    return [{"type": kind, "numbers": numbers, "law": target}
+            for kind, numbers, target, cited in scan_references(text) if cited]
+
+def node_headings(text: str) -> List[tuple]:
+    """(type, numéro) des intitulés restés dans le contenu d'un nœud."""
+    return [(kind, numbers[0]) for kind, numbers, _, cited in scan_references(text) if not cited and numbers]
+
+def extract_references(structure: List[Dict]) -> List[Dict[str, Any]]:
+    """Renvois de chaque nœud (intitulé et contenu), avec le chemin du nœud
+    source ("0/3/1", même convention que les index dérivés)."""
+    refs = []
+    stack = [(structure, "")]
+    while stack:
+        nodes, prefix = stack.pop()
+        pending = []
+        for i, node in enumerate(nodes):
+            path = f"{prefix}{i}"
+            for ref in node_references(f"{node['title']} {node['content']}"):
+                refs.append({"from": path, **ref})
+            if node["children"]:
+                pending.append((node["children"], path + "/"))
+        stack.extend(reversed(pending))
+    return refs
+
+# === 3 ter. CONTEXTE DES NŒUDS ===
+# Calculé une fois à la conversion et rangé dans le JSON (clé "context", une
+# entrée par nœud en ordre préfixe) pour afficher un nœud avec son contexte
+# sans parcourir l'arbre : parent et fil d'Ariane, voisins de même type,
+# position dans le texte continu de la loi.
+# Les nœuds sont désignés par leur chemin ("0/3/1"), comme dans les renvois,
+# les fragments et l'index de recherche (identifiant complet "<clé>#<chemin>").
+# Les positions sont relatives au début du parent (de la loi pour un nœud
+# racine) : modifier un article ne déplace que ses frères suivants, pas
+# toutes les entrées qui le suivent ; la fin d'un sous-arbre, qui changerait
+# pour tous les ancêtres, se déduit des positions (absolute_spans).
+# Le contexte se déduit de l'intro et de la structure : les stocks dérivés
+# (versions, arbre compact) ne le conservent pas et le recalculent.
+CONTEXT_SEPARATOR = "\n\n"
+
+def preorder(structure: List[Dict]) -> Iterator[tuple]:
+    """(nœud, chemin, profondeur) dans l'ordre de lecture."""
+    stack = [(iter(enumerate(structure)), "", 0)]
+    while stack:
+        item = next(stack[-1][0], None)
+        if item is None:
+            stack.pop()
+            continue
+        i, node = item
+        prefix, depth = stack[-1][1], stack[-1][2]
+        yield node, f"{prefix}{i}", depth
+        if node["children"]:
+            stack.append((iter(enumerate(node["children"])), f"{prefix}{i}/", depth + 1))
+
+def node_block(node: Dict[str, Any]) -> str:
+    return f"{node['marker']}\n{node['content']}" if node["content"] else node["marker"]
+
+def law_text(intro: str, structure: List[Dict]) -> str:
+    """Texte continu de la loi auquel renvoient les positions (en
+    caractères) : l'intro puis le marqueur et le contenu de chaque nœud."""
+    return CONTEXT_SEPARATOR.join([intro] + [node_block(node) for node, _, _ in preorder(structure)])
+
+def node_context(intro: str, structure: List[Dict]) -> List[Dict[str, Any]]:
+    """`span` : début et fin du bloc du nœud, relatifs au début du parent
+    (0 = début de la loi pour un nœud racine)."""
+    context = []
+    chain: List[tuple] = []  # (indice, titre, début absolu) des ancêtres du nœud courant
+    last_of_type: Dict[str, int] = {}
+    position = len(intro)
+    for node, path, depth in preorder(structure):
+        del chain[depth:]
+        origin = chain[-1][2] if chain else 0
+        start = position + len(CONTEXT_SEPARATOR)
+        position = start + len(node_block(node))
+        entry = {"path": path, "parent": context[chain[-1][0]]["path"] if chain else None,
+                 "breadcrumb": [title for _, title, _ in chain], "prev": None, "next": None,
+                 "span": [start - origin, position - origin]}
+        previous = last_of_type.get(node["type"])
+        if previous is not None:
+            entry["prev"] = context[previous]["path"]
+            context[previous]["next"] = path
+        last_of_type[node["type"]] = len(context)
+        chain.append((len(context), node["title"], start))
+        context.append(entry)
+    return context
+
+def absolute_spans(context: List[Dict[str, Any]]) -> List[tuple]:
+    """(début, fin, fin du sous-arbre) de chaque entrée dans le texte continu
+    de la loi (law_text)."""
+    spans: List[list] = []
+    starts: Dict[str, int] = {}
+    open_nodes: List[int] = []  # ancêtres de l'entrée courante (indices)
+    for entry in context:
+        parent = entry["parent"]
+        # Les sous-arbres qui ne contiennent pas ce nœud sont refermés par
+        # la fin de l'entrée précédente
+        while open_nodes and context[open_nodes[-1]]["path"] != parent:
+            spans[open_nodes.pop()][2] = spans[-1][2]
+        origin = starts[parent] if parent is not None else 0
+        start, end = origin + entry["span"][0], origin + entry["span"][1]
+        starts[entry["path"]] = start
+        open_nodes.append(len(spans))
+        spans.append([start, end, end])
+    while open_nodes:
+        spans[open_nodes.pop()][2] = spans[-1][2]
+    return [tuple(span) for span in spans]
+
+def context_by_path(law: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Accès direct aux entrées par chemin (à construire une fois au
+    chargement) ; recalculées pour un JSON antérieur qui n'en a pas."""
+    context = law.get("context")
+    if context is None:
+        context = node_context(law["intro"], law["structure"])
+    return {entry["path"]: entry for entry in context}
+
+# === 4. CONVERSION JSON ===
+# Caractères pour lesquels la relecture ligne à ligne du fichier nettoyé
+# diverge des enregistrements en mémoire : sauts de ligne reconnus par
+# splitlines() et caractères des marqueurs visuels.
+DIRECT_UNSAFE_RE = re.compile('[\x0b\x0c\x1c-\x1e\x85\u2028\u2029╔═╗╠─╣╟┄╢╙⋅╜╾╼]')
+
+def extract_intro(text: str) -> str:
+    if '╔═══════' not in text:
+        return ""
+    intro_part = text.split('╔═══════', 1)[0]
+    intro = re.sub(r'^محتوى:\s*', '', intro_part)
+    return re.sub(r'\s+', ' ', intro).strip()
+
+def records_intro(records: List[tuple]) -> str:
+    # Même résultat que extract_intro sur le texte rendu : tout ce qui précède le premier قسم
+    lines = []
+    for record in records:
+        if record[0] == "section" and record[1] == "قسم":
+            break
+        lines.append(record_line(record))
+    else:
+        return ""
+    intro = re.sub(r'^محتوى:\s*', '', " ".join(lines))
+    return re.sub(r'\s+', ' ', intro).strip()
+
+def law_title(clean_path: Path) -> str:
+    return clean_path.stem.replace("_clean", "").replace("-", " ")
+
+def count_sections(structure: List[Dict]) -> Counter:
+    """Nombre de nœuds par niveau, en un seul parcours de l'arbre."""
+    counts = Counter()
+    stack = [structure]
+    while stack:
+        for node in stack.pop():
+            counts[node["type"]] += 1
+            if node.get("children"):
+                stack.append(node["children"])
+    return counts
+
+def write_law_json(clean_path: Path, json_path: Path, intro: str, structure: List[Dict],
+                   metrics: Optional[FileMetrics] = None):
+    metrics = metrics or FileMetrics(str(clean_path))
+    with metrics.stage("renvois"):
+        references = extract_references(structure)
+    with metrics.stage("contexte"):
+        context = node_context(intro, structure)
+    law = {
+        "title": law_title(clean_path),
+        "type": "قانون تنظيمي",
+        "intro": intro,
+        "structure": structure,
+        "references": references,
+        "context": context,
+        "source_path": str(clean_path.relative_to(BASE_DIR))
+    }
+
+    with metrics.stage("json"):
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(law, f, ensure_ascii=False, indent=2)
+    metrics.add("bytes_out", json_path.stat().st_size)
+
+    counts = count_sections(structure)
+    metrics.record["sections"] = {level: counts[level] for level in LEVEL_ORDER}
+    print(f"JSON généré : {json_path.relative_to(BASE_DIR)} | {counts['قسم']} قسم | {counts['باب']} باب | "
+          f"{counts['فصل']} فصل | {counts['مادة']} مادة")
+
+def convert_to_json(clean_path: Path, json_path: Path, metrics: Optional[FileMetrics] = None):
+    metrics = metrics or FileMetrics(str(clean_path))
+    print(f"Conversion JSON : {clean_path.relative_to(BASE_DIR)}")
+    with metrics.stage("parsing"):
+        text = clean_path.read_text(encoding="utf-8")
+        structure = clean_structure(build_structure(cleaned_txt_records(text.splitlines())))
+    write_law_json(clean_path, json_path, extract_intro(text), structure, metrics)
+
+def clean_and_convert(input_path: Path, clean_path: Path, json_path: Path, write_clean: bool = True,
+                      metrics: Optional[FileMetrics] = None) -> bool:
+    """Mode direct : les sections détectées alimentent l'arbre en mémoire, sans
+    relire le fichier nettoyé. Celui-ci n'est écrit que si `write_clean`."""
+    metrics = metrics or FileMetrics(str(input_path))
+    cleaned = clean_to_records(input_path, metrics)
+    if cleaned is None:
+        return False
+    clean, records = cleaned
+
+    fallback = DIRECT_UNSAFE_RE.search(clean) is not None
+    text = None
+    if write_clean or fallback:
+        with metrics.stage("rendu"):
+            text = render_cleaned_txt(records)
+    if write_clean:
+        write_cleaned_txt(clean_path, text, metrics)
+
+    print(f"Conversion JSON : {clean_path.relative_to(BASE_DIR)}")
+    with metrics.stage("parsing"):
+        intro, structure = law_structure(clean, records, text)
+    write_law_json(clean_path, json_path, intro, structure, metrics)
+    return True
+
+def read_intro(clean_path: Path) -> str:
+    """extract_intro sans charger le fichier : seules les lignes précédant le
+    premier قسم sont lues (et rien n'est gardé s'il n'y en a pas)."""
+    with open(clean_path, encoding="utf-8") as f:
+        if not any('╔═══════' in line for line in f):
+            return ""
+        f.seek(0)
+        lines = []
+        for line in f:
+            lines.append(line)
+            if '╔═══════' in line:
+                break
+    return extract_intro("".join(lines))
+
+def convert_to_json_streaming(clean_path: Path, json_path: Path, metrics: Optional[FileMetrics] = None):
+    """convert_to_json en relisant le fichier nettoyé ligne à ligne ; seul
+    l'arbre de la loi est en mémoire."""
+    metrics = metrics or FileMetrics(str(clean_path))
+    print(f"Conversion JSON : {clean_path.relative_to(BASE_DIR)}")
+    with metrics.stage("parsing"):
+        structure = clean_structure(parse_cleaned_txt(clean_path))
+        intro = read_intro(clean_path)
+    write_law_json(clean_path, json_path, intro, structure, metrics)
+
+def law_structure(clean: str, records: List[tuple], text: Optional[str] = None):
+    """(intro, structure) depuis les enregistrements en mémoire ; repli sur la
+    relecture du texte rendu quand le mode direct divergerait. `text` évite
+    un second rendu s'il a déjà été calculé."""
+    if DIRECT_UNSAFE_RE.search(clean) is not None:
+        text = text if text is not None else render_cleaned_txt(records)
+        records = list(cleaned_txt_records(text.splitlines()))
+        return extract_intro(text), clean_structure(build_structure(records))
+    return records_intro(records), clean_structure(build_structure(records))
+
+def convert_text(raw: str, title: str) -> Dict[str, Any]:
+    """Texte OCR brut → loi au format JSON, sans aucun fichier (service)."""
+    clean = normalize_text(raw)[0]
+    intro, structure = law_structure(clean, section_records(clean, detect_sections(clean)))
+    return {"title": title, "type": "قانون تنظيمي", "intro": intro, "structure": structure,
+            "references": extract_references(structure), "context": node_context(intro, structure)}
+
+# === 5. MANIFESTE (RECONSTRUCTION INCRÉMENTALE) ===
+def file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def load_manifest(path: Path = MANIFEST_PATH) -> Dict[str, Any]:
+    empty = {"version": PIPELINE_VERSION, "files": {}}
+    if not path.exists():
+        return empty
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        print(f"Manifeste illisible, reconstruction complète : {path.name}")
+        return empty
+    if manifest.get("version") != PIPELINE_VERSION:
+        print(f"Version du pipeline modifiée ({manifest.get('version')} → {PIPELINE_VERSION}), reconstruction complète")
+        return empty
+    return manifest
+
+def save_manifest(manifest: Dict[str, Any], path: Path = MANIFEST_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+
+# Build réparti : chaque fichier appartient à un shard fixé par un hachage
+# stable de son chemin relatif (indépendant de la machine, de PYTHONHASHSEED
+# et des autres fichiers : un ajout ne déplace aucun fichier existant).
+def shard_of(key: str, shards: int) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") % shards
+
+def shard_manifest_path(index: int, shards: int) -> Path:
+    return SHARDS_DIR / f"manifest-{index:03d}-of-{shards:03d}.json"
+
+def manifest_entry(txt_file: Path, digest: str, write_clean: bool = True, ref: Optional[str] = None) -> Dict[str, Any]:
+    clean_file, json_file = output_paths(txt_file)
+    entry = {
+        "hash": digest,
+        "version": PIPELINE_VERSION,
+        "clean": clean_file.relative_to(BASE_DIR).as_posix() if write_clean and ref is None else None,
+        "json": json_file.relative_to(BASE_DIR).as_posix(),
+    }
+    if CORRECTIONS.digest:
+        # Un nouveau dictionnaire OCR rend les sorties existantes obsolètes
+        entry["rules"] = CORRECTIONS.digest
+    if ref is not None:
+        entry["ref"] = ref
+    return entry
+
+def is_up_to_date(old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+    return (
+        old is not None
+        and old.get("hash") == new["hash"]
+        and old.get("version") == new["version"]
+        and old.get("ref") == new.get("ref")
+        and old.get("rules") == new.get("rules")
+        and all((BASE_DIR / new[k]).exists() for k in ("clean", "json") if new[k])
+    )
+
+def manifest_files(path: Path = MANIFEST_PATH) -> Dict[str, Any]:
+    """Entrées du manifeste précédent, quelle que soit sa version : ce sont
+    les seules sorties que le pipeline sait avoir écrites lui-même."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+def prune_orphans(previous: Dict[str, Any], expected: set, log=print) -> int:
+    """Supprime les sorties des entrées de `previous` dont l'entrée .txt a
+    disparu. Les fichiers que le pipeline n'a pas produits (lois venues d'une
+    source .json, ajouts manuels) ne sont jamais touchés."""
+    removed = 0
+    parents = set()
+    for key, entry in sorted(previous.items()):
+        if (INPUT_ROOT / key).is_file():
+            continue
+        for k in ("clean", "json"):
+            f = BASE_DIR / entry[k] if entry.get(k) else None
+            if f is not None and f not in expected and f.is_file():
+                f.unlink()
+                log(f"SUPPRIMÉ (orphelin) : {f.relative_to(BASE_DIR)}")
+                parents.add(f.parent)
+                removed += 1
+    # Dossiers vidés par la suppression, du plus profond au moins profond
+    for d in sorted(parents, key=lambda d: len(d.parts), reverse=True):
+        while d not in (CLEAN_ROOT, JSON_ROOT) and d.is_dir() and not any(d.iterdir()):
+            d.rmdir()
+            d = d.parent
+    return removed
+
+def keep_orphans(previous: Dict[str, Any], files: Dict[str, Any]) -> int:
+    """Sans suppression, les entrées dont le .txt a disparu restent au
+    manifeste : un build ultérieur avec `prune` saura encore les retirer."""
+    kept = 0
+    for key, entry in previous.items():
+        if key not in files and not (INPUT_ROOT / key).is_file():
+            files[key] = entry
+            kept += 1
+    return kept
+
+def write_law_reference(clean_path: Path, json_path: Path, canonical_json: Path):
+    """Copie identique d'une loi déjà convertie (même contenu, autre dossier de
+    catégorie) : seul un renvoi vers la version canonique est écrit."""
+    reference = {
+        "title": law_title(clean_path),
+        "type": "قانون تنظيمي",
+        "ref": law_key(canonical_json),
+        "source_path": str(clean_path.relative_to(BASE_DIR))
+    }
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(reference, f, ensure_ascii=False, indent=2)
+
+# Dédoublonnage par contenu converti : une loi fournie en .json (text/…/X.json,
+# présente telle quelle sous json/) arrive aussi en .txt dans d'autres
+# dossiers de catégorie. Les fichiers sources n'ont alors pas la même
+# empreinte, mais la conversion donne la même loi : la copie convertie
+# devient un renvoi vers la loi fournie. L'entrée du manifeste garde
+# l'empreinte du contenu ("ref_digest") pour rester valide sans reconversion.
+CONTENT_FIELDS = ("title", "type", "intro", "structure")
+
+def law_content_digest(law: Dict[str, Any]) -> str:
+    content = json.dumps([law.get(k) for k in CONTENT_FIELDS], ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+def provided_laws() -> Dict[str, str]:
+    """{empreinte du contenu: clé} des lois fournies en .json (premier chemin
+    trié pour un même contenu)."""
+    provided = {}
+    for source in sorted(INPUT_ROOT.rglob("*.json")):
+        json_file = JSON_ROOT / source.relative_to(INPUT_ROOT)
+        if not json_file.is_file():
+            continue
+        with open(json_file, encoding="utf-8") as f:
+            law = json.load(f)
+        if "ref" not in law:
+            provided.setdefault(law_content_digest(law), law_key(json_file))
+    return provided
+
+def content_reference(entry: Dict[str, Any], ref: str, digest: str) -> Dict[str, Any]:
+    return dict(entry, clean=None, ref=ref, ref_digest=digest)
+
+def reference_provided_copy(txt_file: Path, entry: Dict[str, Any], provided: Dict[str, str]) -> Dict[str, Any]:
+    """Remplace la sortie qui vient d'être convertie par un renvoi si elle est
+    identique à une loi fournie ; renvoie l'entrée du manifeste."""
+    clean_file, json_file = output_paths(txt_file)
+    with open(json_file, encoding="utf-8") as f:
+        digest = law_content_digest(json.load(f))
+    ref = provided.get(digest)
+    if ref is None or ref == law_key(json_file):
+        return entry
+    write_law_reference(clean_file, json_file, JSON_ROOT / f"{ref}.json")
+    clean_file.unlink(missing_ok=True)
+    return content_reference(entry, ref, digest)
+
+# === 6. TRAITEMENT D'UN FICHIER (EXÉCUTABLE DANS UN PROCESSUS DU POOL) ===
+def output_paths(txt_file: Path):
+    rel_path = txt_file.relative_to(INPUT_ROOT)
+    clean_file = CLEAN_ROOT / rel_path.parent / (rel_path.stem + "_clean.txt")
+    json_file = JSON_ROOT / rel_path.parent / (rel_path.stem + ".json")
+    return clean_file, json_file
+
+def process_file(txt_file: Path, write_clean: bool = True, profile_dir: Optional[Path] = None,
+                 trace_memory: bool = False, stream_above: int = STREAM_THRESHOLD) -> Dict[str, Any]:
+    """Nettoie et convertit un fichier. Les `print` sont capturés dans `log`
+    pour que le processus principal les affiche dans l'ordre des entrées ;
+    les mesures de l'étape sont renvoyées dans `metrics`. Au-delà de
+    `stream_above` octets, le nettoyage se fait en flux."""
+    clean_file, json_file = output_paths(txt_file)
+    result = {"source": txt_file, "status": "ok", "error": None, "log": ""}
+    metrics = FileMetrics(txt_file.relative_to(INPUT_ROOT).as_posix(), profile_dir, trace_memory)
+    buffer = io.StringIO()
+    start = perf_counter()
+    try:
+        with redirect_stdout(buffer):
+            clean_file.parent.mkdir(parents=True, exist_ok=True)
+            json_file.parent.mkdir(parents=True, exist_ok=True)
+            if txt_file.stat().st_size > stream_above:
+                if clean_legal_txt_streaming(txt_file, clean_file, metrics=metrics):
+                    convert_to_json_streaming(clean_file, json_file, metrics)
+                    if not write_clean:
+                        clean_file.unlink()
+                else:
+                    result["status"] = "échec"
+            elif not clean_and_convert(txt_file, clean_file, json_file, write_clean=write_clean, metrics=metrics):
+                result["status"] = "échec"
+    except Exception as e:
+        result["status"] = "erreur"
+        result["error"] = f"{type(e).__name__}: {e}"
+    metrics.fail(result["status"], result["error"])
+    metrics.record["seconds"] = round(perf_counter() - start, 6)
+    result["log"] = buffer.getvalue()
+    result["metrics"] = metrics.record
+    return result
+
+# === 7. TRAITEMENT RÉCURSIF ===
+def process_all_files(force: bool = False, prune: bool = False, workers: int = 1, write_clean: bool = True,
+                      quiet: bool = False, metrics_path: Optional[Path] = None,
+                      profile_dir: Optional[Path] = None, trace_memory: bool = False,
+                      stream_above: int = STREAM_THRESHOLD, shard: Optional[tuple] = None):
+    """`quiet` n'affiche que le bilan ; `metrics_path` reçoit un enregistrement
+    JSON par fichier traité puis un bilan (voir metrics.py). `shard` = (i, N) :
+    ne traiter que les fichiers du shard i sur N, avec son propre manifeste et
+    sans suppression d'orphelins (les sorties des autres shards n'en sont pas) ;
+    la fusion se fait ensuite avec sharded_build.py. `prune` supprime les
+    sorties des entrées du manifeste précédent dont le .txt a disparu."""
+    def log(*args, **kwargs):
+        if not quiet:
+            print(*args, **kwargs)
+
+    started = perf_counter()
+    txt_files = sorted([f for f in INPUT_ROOT.rglob("*.txt") if f.is_file()])
+    log(f"{len(txt_files)} fichiers .txt trouvés dans {INPUT_ROOT} (et sous-dossiers)\n")
+    manifest_path = MANIFEST_PATH
+    if shard is not None:
+        index, shards = shard
+        txt_files = [f for f in txt_files if shard_of(f.relative_to(INPUT_ROOT).as_posix(), shards) == index]
+        manifest_path = shard_manifest_path(index, shards)
+        prune = False
+        log(f"Shard {index}/{shards} : {len(txt_files)} fichiers\n")
+
+    old_manifest = {} if force else load_manifest(manifest_path)["files"]
+    manifest = {"version": PIPELINE_VERSION, "files": {}}
+    if shard is not None:
+        manifest["shard"] = list(shard)
+    expected = set()
+    pending = []
+    duplicates = []
+    entries = {}
+    canonical_by_hash = {}
+    provided = provided_laws()
+    skipped = 0
+
+    for txt_file in txt_files:
+        clean_file, json_file = output_paths(txt_file)
+        key = txt_file.relative_to(INPUT_ROOT).as_posix()
+        digest = file_hash(txt_file)
+        # Chaque contenu n'est traité qu'une fois : le premier chemin (ordre
+        # trié) est canonique, les copies des autres catégories y renvoient.
+        canonical = canonical_by_hash.setdefault(digest, txt_file)
+        ref = law_key(output_paths(canonical)[1]) if canonical != txt_file else None
+        entry = manifest_entry(txt_file, digest, write_clean, ref)
+        old = old_manifest.get(key)
+        if ref is None and old and "ref_digest" in old and provided.get(old["ref_digest"]) == old["ref"]:
+            # Copie d'une loi fournie, toujours identique à celle-ci
+            entry = content_reference(entry, old["ref"], old["ref_digest"])
+        entries[txt_file] = (key, entry)
+        expected.add(json_file)
+        if entry["clean"]:
+            expected.add(clean_file)
+
+        if is_up_to_date(old_manifest.get(key), entry):
+            manifest["files"][key] = entry
+            skipped += 1
+        elif canonical != txt_file:
+            duplicates.append((txt_file, canonical))
+        else:
+            pending.append(txt_file)
+
+    task = partial(process_file, write_clean=write_clean, profile_dir=profile_dir, trace_memory=trace_memory,
+                   stream_above=stream_above)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(pending) > 1:
+        log(f"{len(pending)} fichiers à traiter sur {workers} processus")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() rend les résultats dans l'ordre des entrées : sortie déterministe
+            results = list(pool.map(task, pending, chunksize=max(1, len(pending) // (workers * 4))))
+    else:
+        results = map(task, pending)
+
+    rebuilt = 0
+    referenced = 0
+    failures = []
+    with MetricsWriter(metrics_path) as writer:
+        for result in results:
+            txt_file = result["source"]
+            log(f"\nTRAITEMENT : {txt_file.relative_to(BASE_DIR)}")
+            log("-" * 60)
+            log(result["log"], end="")
+            writer.write(result["metrics"])
+            if result["status"] == "ok":
+                key, entry = entries[txt_file]
+                entry = reference_provided_copy(txt_file, entry, provided)
+                if "ref" in entry:
+                    log(f"RÉFÉRENCE : {entry['json']} → {entry['ref']} (même contenu)")
+                    expected.discard(output_paths(txt_file)[0])
+                    referenced += 1
+                entries[txt_file] = (key, entry)
+                manifest["files"][key] = entry
+                rebuilt += 1
+            else:
+                log(f"ÉCHEC : {txt_file.name}" + (f" ({result['error']})" if result["error"] else ""))
+                failures.append(result)
+
+        for txt_file, canonical in duplicates:
+            key, entry = entries[txt_file]
+            if entries[canonical][0] not in manifest["files"]:
+                error = f"copie de {canonical.name} (en échec)"
+                failures.append({"source": txt_file, "status": "échec", "error": error})
+                writer.write({"event": "file", "source": key, "status": "échec", "error": error})
+                continue
+            clean_file, json_file = output_paths(txt_file)
+            write_law_reference(clean_file, json_file, output_paths(canonical)[1])
+            log(f"RÉFÉRENCE : {json_file.relative_to(BASE_DIR)} → {entry['ref']}")
+            manifest["files"][key] = entry
+            referenced += 1
+
+        previous = manifest_files(manifest_path)
+        if prune:
+            removed = prune_orphans(previous, expected, log)
+        else:
+            removed = 0
+            keep_orphans(previous, manifest["files"])
+        save_manifest(manifest, manifest_path)
+        writer.write({"event": "summary", "files": len(txt_files), "rebuilt": rebuilt, "referenced": referenced,
+                      "skipped": skipped, "failures": len(failures), "removed": removed,
+                      "workers": workers, "seconds": round(perf_counter() - started, 6)})
+
+    log(f"\nTOUS LES FICHIERS TRAITÉS !")
+    print(f"Reconstruits : {rebuilt} | Copies référencées : {referenced} | Inchangés : {skipped} | "
+          f"Échecs : {len(failures)} | Orphelins supprimés : {removed}")
+    for result in failures:
+        print(f"   ✗ {result['source'].relative_to(BASE_DIR)} : {result['error'] or result['status']}")
+    log(f"Nettoyés → {CLEAN_ROOT}")
+    log(f"JSON → {JSON_ROOT}")
+
+# === 8. LECTURE DU CORPUS CONVERTI ===
+def law_key(json_file: Path, json_root: Path = JSON_ROOT) -> str:
+    """Identifiant stable d'une loi : chemin relatif sous json/, sans extension."""
+    return json_file.relative_to(json_root).with_suffix("").as_posix()
+
+def iter_json_laws(json_root: Path = JSON_ROOT, include_refs: bool = False,
+                   aliases: Optional[Dict[str, str]] = None) -> Iterator[tuple]:
+    """(clé de la loi, contenu JSON) pour chaque loi, dans l'ordre des chemins.
+    Les renvois vers une copie canonique (clé "ref") sont ignorés par défaut
+    pour que chaque loi n'apparaisse qu'une fois dans les index dérivés ;
+    `aliases` reçoit alors {clé du renvoi: clé visée} pour que les lecteurs
+    servent aussi la loi sous la clé de sa copie (voir resolve_alias)."""
+    for json_file in sorted(json_root.rglob("*.json")):
+        with open(json_file, encoding="utf-8") as f:
+            law = json.load(f)
+        if include_refs or "ref" not in law:
+            yield law_key(json_file, json_root), law
+        elif aliases is not None:
+            aliases[law_key(json_file, json_root)] = law["ref"]
+
+def resolve_alias(aliases: Dict[str, str], key: str) -> str:
+    """Clé de la loi effectivement stockée ; un renvoi peut viser une copie
+    qui est elle-même un renvoi."""
+    seen = set()
+    while key in aliases and key not in seen:
+        seen.add(key)
+        key = aliases[key]
+    return key
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nettoyage et conversion JSON du corpus juridique")
+    parser.add_argument("--force", action="store_true", help="ignorer le manifeste et tout reconstruire")
+    parser.add_argument("--prune", action="store_true",
+                        help="supprimer les sorties des fichiers .txt retirés depuis le build précédent")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="nombre de processus (0 = tous les cœurs)")
+    parser.add_argument("--no-clean-txt", action="store_true",
+                        help="ne pas écrire les fichiers _clean.txt intermédiaires (débogage)")
+    parser.add_argument("--index", action="store_true",
+                        help="reconstruire l'index SQLite du corpus après la conversion")
+    parser.add_argument("--refs", action="store_true",
+                        help="reconstruire le graphe des renvois entre articles après la conversion")
+    parser.add_argument("--versions", action="store_true",
+                        help="ranger les nouvelles versions des lois dans le stock versionné (deltas)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="n'afficher que le bilan final")
+    parser.add_argument("--metrics", type=Path, metavar="FICHIER",
+                        help="ajouter les mesures par fichier (JSON lines) à ce fichier")
+    parser.add_argument("--profile", type=Path, metavar="DOSSIER",
+                        help="profil cProfile de chaque étape de chaque fichier (.prof) dans ce dossier")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="mesurer le pic mémoire de chaque étape (tracemalloc, plus lent)")
+    parser.add_argument("--stream-above", type=float, default=STREAM_THRESHOLD / 1024 / 1024, metavar="Mo",
+                        help="nettoyer en flux (mémoire bornée) les fichiers plus gros que cette taille")
+    parser.add_argument("--shard", metavar="I/N",
+                        help="ne traiter que le shard I sur N (build réparti, fusion : sharded_build.py merge)")
+    args = parser.parse_args()
+    shard = None
+    if args.shard:
+        try:
+            shard = tuple(int(x) for x in args.shard.split("/"))
+            if len(shard) != 2 or not 0 <= shard[0] < shard[1]:
+                raise ValueError
+        except ValueError:
+            parser.error(f"--shard attend I/N avec 0 ≤ I < N : {args.shard}")
+        if args.index or args.refs or args.versions:
+            parser.error("--index, --refs et --versions portent sur tout le corpus : les passer à la fusion")
+    process_all_files(force=args.force, prune=args.prune, workers=args.workers,
+                      write_clean=not args.no_clean_txt, quiet=args.quiet, metrics_path=args.metrics,
+                      profile_dir=args.profile, trace_memory=args.trace_memory,
+                      stream_above=int(args.stream_above * 1024 * 1024), shard=shard)
+    if args.index:
+        from corpus_index import build_index
+        build_index()
+    if args.refs:
+        from cross_refs import build_reference_graph
+        build_reference_graph()
+    if args.versions:
+        from law_versions import update_versions
+        update_versions()
@@ -0,0 +1,192 @@
+# src/bench_pipeline.py
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+
+from batch_clean_and_convert import (
+    BASE_DIR, INPUT_ROOT, PIPELINE_VERSION,
+    strip_layout, fix_ocr_al, fix_double_letters, collapse_whitespace, fix_dictionary, detect_sections,
+    section_records, render_cleaned_txt, parse_cleaned_txt, clean_structure, extract_intro, extract_references,
+    node_context,
+)
+
+# === CONFIGURATION ===
+BENCH_DIR = BASE_DIR / "benchmarks"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+LATEST_PATH = BENCH_DIR / "latest.json"
+BENCH_VERSION = 1
+
+STAGES = ["normalisation", "ocr", "doublons", "espaces", "dictionnaire", "sections", "rendu",
+          "parsing", "clean_structure", "renvois", "contexte", "json"]
+
+# === 1. ENTRÉES ===
+def corpus_documents() -> List[str]:
+    return [p.read_text(encoding="utf-8", errors="ignore") for p in sorted(INPUT_ROOT.rglob("*.txt"))]
+
+def scaled_document(docs: List[str], scale: int) -> str:
+    # Le plus gros document du corpus répété `scale` fois, pages comprises
+    largest = max(docs, key=len)
+    return "\n".join([largest] * scale)
+
+# === 2. MESURE D'UN DOCUMENT, ÉTAPE PAR ÉTAPE ===
+class StageTimer:
+    """Cumule, par étape, le temps, les octets source et le nombre de
+    documents ; avec `memory`, le pic d'allocation (tracemalloc) de chaque
+    étape."""
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def __call__(self, stage: str, nbytes: int, fn, *args):
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        stat = self.stats.setdefault(stage, {"seconds": 0.0, "bytes": 0, "docs": 0, "peak": 0})
+        stat["seconds"] += elapsed
+        stat["bytes"] += nbytes
+        stat["docs"] += 1
+        if self.memory:
+            stat["peak"] = max(stat["peak"], tracemalloc.get_traced_memory()[1] - before)
+        return result
+
+def run_document(raw: str, work_path: Path, measure: StageTimer):
+    """Même enchaînement que le mode fichier nettoyé : normalisation, rendu,
+    relecture par parse_cleaned_txt puis sérialisation. Les débits sont
+    rapportés à la taille du document source."""
+    n = len(raw.encode("utf-8"))
+    clean = measure("normalisation", n, strip_layout, raw)
+    clean, _ = measure("ocr", n, fix_ocr_al, clean)
+    clean, _ = measure("doublons", n, fix_double_letters, clean)
+    clean = measure("espaces", n, collapse_whitespace, clean)
+    clean, _ = measure("dictionnaire", n, fix_dictionary, clean)
+    sections = measure("sections", n, detect_sections, clean)
+    text = measure("rendu", n, lambda: render_cleaned_txt(section_records(clean, sections)))
+    work_path.write_text(text, encoding="utf-8")
+    structure = measure("parsing", n, parse_cleaned_txt, work_path)
+    structure = measure("clean_structure", n, clean_structure, structure)
+    references = measure("renvois", n, extract_references, structure)
+    intro = extract_intro(text)
+    context = measure("contexte", n, node_context, intro, structure)
+    law = {"title": work_path.stem, "type": "قانون تنظيمي", "intro": intro,
+           "structure": structure, "references": references, "context": context, "source_path": work_path.name}
+    measure("json", n, lambda: json.dumps(law, ensure_ascii=False, indent=2))
+
+def bench_set(docs: List[str], repeat: int, memory: bool) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        work_path = Path(tmp) / "bench_clean.txt"
+        # Temps : meilleur total sur `repeat` passes, sans traçage mémoire
+        best: Dict[str, Dict[str, float]] = {}
+        for _ in range(repeat):
+            timer = StageTimer()
+            for raw in docs:
+                run_document(raw, work_path, timer)
+            for stage, stat in timer.stats.items():
+                if stage not in best or stat["seconds"] < best[stage]["seconds"]:
+                    best[stage] = stat
+        peaks = {}
+        if memory:
+            tracer = StageTimer(memory=True)
+            tracemalloc.start()
+            try:
+                for raw in docs:
+                    run_document(raw, work_path, tracer)
+            finally:
+                tracemalloc.stop()
+            peaks = {stage: stat["peak"] for stage, stat in tracer.stats.items()}
+
+    total_bytes = sum(len(raw.encode("utf-8")) for raw in docs)
+    stages = {}
+    for stage in STAGES:
+        stat = best[stage]
+        seconds = max(stat["seconds"], 1e-9)
+        stages[stage] = {
+            "seconds": round(stat["seconds"], 6),
+            "mb_s": round(stat["bytes"] / seconds / 1e6, 3),
+            "docs_s": round(stat["docs"] / seconds, 3),
+            "peak_mb": round(peaks[stage] / 1e6, 3) if stage in peaks else None,
+        }
+    return {"docs": len(docs), "bytes": total_bytes, "stages": stages}
+
+# === 3. RAPPORT ET COMPARAISON AVEC LA RÉFÉRENCE ===
+def load_baseline(path: Path):
+    if not path.exists():
+        return None
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+    if baseline.get("version") != BENCH_VERSION:
+        print(f"Référence ignorée (version {baseline.get('version')}) : {path}")
+        return None
+    return baseline
+
+def report(results: Dict[str, Any], baseline, tolerance: float) -> int:
+    regressions = 0
+    for name, result in results["sets"].items():
+        print(f"=== {name} : {result['docs']} documents, {result['bytes'] / 1e6:.2f} Mo ===")
+        print(f"{'étape':<16} | {'temps (s)':>10} | {'Mo/s':>9} | {'docs/s':>10} | {'pic (Mo)':>9} | référence")
+        reference = (baseline or {}).get("sets", {}).get(name, {}).get("stages", {})
+        for stage, stat in result["stages"].items():
+            peak = f"{stat['peak_mb']:9.2f}" if stat["peak_mb"] is not None else f"{'-':>9}"
+            versus = "-"
+            old = reference.get(stage)
+            if old and old["seconds"] > 0:
+                ratio = stat["seconds"] / old["seconds"]
+                versus = f"×{ratio:.2f}"
+                if ratio > 1 + tolerance:
+                    versus += "  RÉGRESSION"
+                    regressions += 1
+            print(f"{stage:<16} | {stat['seconds']:10.4f} | {stat['mb_s']:9.2f} | {stat['docs_s']:10.1f} | {peak} | {versus}")
+        print()
+    return regressions
+
+def save_results(results: Dict[str, Any], path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+def run(scales=(10, 100), repeat: int = 3, memory: bool = True) -> Dict[str, Any]:
+    docs = corpus_documents()
+    results = {
+        "version": BENCH_VERSION,
+        "pipeline_version": PIPELINE_VERSION,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "sets": {"corpus": bench_set(docs, repeat, memory)},
+    }
+    for scale in scales:
+        # Une seule passe pour les documents synthétiques : ils sont assez gros
+        results["sets"][f"x{scale}"] = bench_set([scaled_document(docs, scale)], 1, memory)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure étape par étape du pipeline de nettoyage/conversion.")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10, 100],
+                        help="facteurs d'agrandissement du plus gros document (défaut : 10 100)")
+    parser.add_argument("--repeat", type=int, default=3, help="passes sur le corpus, le meilleur temps est retenu")
+    parser.add_argument("--no-memory", action="store_true", help="ne pas mesurer les pics mémoire (tracemalloc)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="fichier de référence à comparer")
+    parser.add_argument("--save", action="store_true", help="enregistrer ces résultats comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="ralentissement toléré avant de signaler une régression (défaut : 0.2 = +20 %%)")
+    args = parser.parse_args()
+
+    results = run(args.scales, args.repeat, not args.no_memory)
+    regressions = report(results, load_baseline(args.baseline), args.tolerance)
+    save_results(results, LATEST_PATH)
+    if args.save:
+        save_results(results, args.baseline)
+        print(f"Référence enregistrée : {args.baseline}")
+    if regressions:
+        print(f"{regressions} régression(s) au-delà de +{args.tolerance:.0%}")
+    sys.exit(1 if regressions and not args.save else 0)
@@ -0,0 +1,68 @@
+# src/bench_sections.py
+import re
+import sys
+import time
+
+from batch_clean_and_convert import INPUT_ROOT, normalize_text, detect_sections
+
+# === ANCIENNE DÉTECTION (CINQ REGEX + TRI), RÉFÉRENCE DE COMPARAISON ===
+LEGACY_PATTERNS = [
+    ('قسم', r'(القسم\s+(?:ال)?(?:أولى?|ثانية?|ثالثة?|رابعة?|خامسة?|سادسة?|سابعة?|ثامنة?|تاسعة?|عاشرة?|\d+)\s*[^\.؛]*?)(?=\s*(?:الباب|الفصل|المادة|$))'),
+    ('باب', r'(الباب\s+(?:ال)?(?:أول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|\d+)\s*[^\.؛]*?)(?=\s*(?:الفصل|الفرع|المادة|$))'),
+    ('فصل', r'(الفصل\s+(?:ال)?(?:أول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|\d+)\s*[^\.؛]*?)(?=\s*(?:الفرع|المادة|$))'),
+    ('فرع', r'(الفرع\s+(?:ال)?(?:أول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|\d+)\s*[^\.؛]*?)(?=\s*(?:المادة|$))'),
+    ('مادة', r'(المادة\s+(?:ال)?(?:أولى|ثانية|ثالثة|رابعة|خامسة|سادسة|سابعة|ثامنة|تاسعة|عاشرة|\d+(?:\s*مكرر(?:\s*\d*)?)?)\s*[^\.؛]*?)(?=\s*(?:المادة|$))'),
+]
+LEGACY_REGEXES = [(t, re.compile(p, re.IGNORECASE)) for t, p in LEGACY_PATTERNS]
+
+def legacy_detect_sections(clean: str):
+    sections = []
+    for sec_type, regex in LEGACY_REGEXES:
+        for match in regex.finditer(clean):
+            sections.append({'type': sec_type, 'title': match.group(1).strip(), 'start': match.start(), 'end': match.end()})
+    sections.sort(key=lambda x: x['start'])
+    return sections
+
+# === ENTRÉES SYNTHÉTIQUES ===
+def corpus_text() -> str:
+    docs = [normalize_text(p.read_text(encoding="utf-8", errors="ignore"))[0]
+            for p in sorted(INPUT_ROOT.rglob("*.txt"))]
+    return " ".join(docs)
+
+def realistic(base: str, size: int) -> str:
+    return (base * (size // len(base) + 1))[:size]
+
+def adversarial(size: int) -> str:
+    # Mentions de titres sans ponctuation ni terminateur avant un point final :
+    # chaque tentative de l'ancienne regex rebalaye tout le reste du texte.
+    unit = "القسم الأول الفرع 2 نص بدون نقطة "
+    return unit * (size // len(unit)) + "."
+
+def timed(fn, text: str) -> float:
+    start = time.perf_counter()
+    fn(text)
+    return time.perf_counter() - start
+
+# === BENCHMARK ===
+def run(max_size: int = 8_000_000, legacy_limit: int = 50_000):
+    base = corpus_text()
+    print(f"Corpus normalisé : {len(base):,} caractères\n")
+    for name, make in (("réaliste", lambda n: realistic(base, n)), ("adverse", adversarial)):
+        print(f"=== Entrées {name} ===")
+        print(f"{'taille':>12} | {'linéaire (s)':>12} | {'µs/Ko':>8} | {'regex (s)':>10} | identique")
+        size = 25_000
+        while size <= max_size:
+            text = make(size)
+            t_new = timed(detect_sections, text)
+            if size <= legacy_limit:
+                t_old = timed(legacy_detect_sections, text)
+                same = "oui" if legacy_detect_sections(text) == detect_sections(text) else "NON"
+                old = f"{t_old:10.3f}"
+            else:
+                old, same = f"{'-':>10}", "-"
+            print(f"{len(text):>12,} | {t_new:12.4f} | {t_new / len(text) * 1e9:8.1f} | {old} | {same}")
+            size *= 2
+        print()
+
+if __name__ == "__main__":
+    run(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,162 @@
+# src/chunks.py
+import re
+import json
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT, iter_json_laws
+
+# === CONFIGURATION ===
+CHUNKS_DIR = BASE_DIR / "corpus" / "chunks"
+MAX_TOKENS = 300
+BATCH_SIZE = 1000
+
+# Fin de phrase : point, point-virgule arabe ou deux-points suivis d'un blanc
+SENTENCE_END_RE = re.compile(r'(?<=[.؛:!?])\s+')
+
+def count_tokens(text: str) -> int:
+    # Mots séparés par des blancs : estimation prudente, indépendante du
+    # tokenizer du modèle d'embedding
+    return len(text.split())
+
+# === 1. DÉCOUPAGE D'UN TEXTE LONG ===
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """Morceaux d'au plus `max_tokens` mots, coupés en fin de phrase quand
+    c'est possible."""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    parts = []
+    current: List[str] = []
+    size = 0
+    for sentence in SENTENCE_END_RE.split(text):
+        words = sentence.split()
+        if size + len(words) > max_tokens and current:
+            parts.append(" ".join(current))
+            current, size = [], 0
+        while len(words) > max_tokens:
+            parts.append(" ".join(words[:max_tokens]))
+            words = words[max_tokens:]
+        current.extend(words)
+        size += len(words)
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+# === 2. PARCOURS DE LA STRUCTURE ===
+def node_text(node: Dict[str, Any]) -> str:
+    return f"{node['title']}\n{node['content']}"
+
+class ChunkBuilder:
+    """Parcourt l'arbre d'une loi et produit les morceaux : chaque nœud avec
+    contenu en donne au moins un ; les feuilles voisines courtes sont
+    regroupées tant que le budget le permet."""
+
+    def __init__(self, key: str, law: Dict[str, Any], max_tokens: int = MAX_TOKENS):
+        self.key = key
+        self.law = law
+        self.max_tokens = max_tokens
+
+    def chunk(self, nodes: List[tuple], ancestors: List[Dict[str, str]], text: str,
+              part: Optional[int] = None) -> Dict[str, Any]:
+        first_path = nodes[0][0] if nodes else ""
+        chunk_id = f"{self.key}#{first_path}" + (f"~{part}" if part is not None else "")
+        return {
+            "id": chunk_id,
+            "law": self.key,
+            "law_title": self.law["title"],
+            "ancestors": ancestors,
+            "articles": [node["number"] for _, node in nodes if node["type"] == "مادة"],
+            "paths": [path for path, _ in nodes],
+            "text": text,
+            "tokens": count_tokens(text),
+        }
+
+    def single(self, path: str, node: Dict[str, Any], ancestors) -> Iterator[Dict[str, Any]]:
+        parts = split_text(node_text(node), self.max_tokens)
+        for i, text in enumerate(parts):
+            yield self.chunk([(path, node)], ancestors, text, i if len(parts) > 1 else None)
+
+    def walk(self, children: List[Dict[str, Any]], prefix: str, ancestors) -> Iterator[Dict[str, Any]]:
+        packed: List[tuple] = []
+        size = 0
+
+        def flush():
+            text = "\n".join(node_text(node) for _, node in packed)
+            return self.chunk(list(packed), ancestors, text)
+
+        for i, node in enumerate(children):
+            path = f"{prefix}{i}"
+            tokens = count_tokens(node_text(node)) if node["content"] else 0
+            leaf = not node["children"]
+            if leaf and node["content"] and tokens <= self.max_tokens:
+                if packed and size + tokens > self.max_tokens:
+                    yield flush()
+                    packed, size = [], 0
+                packed.append((path, node))
+                size += tokens
+                continue
+            if packed:
+                yield flush()
+                packed, size = [], 0
+            if node["content"]:
+                yield from self.single(path, node, ancestors)
+            if node["children"]:
+                context = ancestors + [{"type": node["type"], "title": node["title"]}]
+                yield from self.walk(node["children"], path + "/", context)
+        if packed:
+            yield flush()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.law.get("intro"):
+            parts = split_text(self.law["intro"], self.max_tokens)
+            for i, text in enumerate(parts):
+                yield self.chunk([], [], text, i if len(parts) > 1 else None)
+        yield from self.walk(self.law["structure"], "", [])
+
+def iter_chunks(json_root: Path = JSON_ROOT, max_tokens: int = MAX_TOKENS) -> Iterator[Dict[str, Any]]:
+    """Morceaux de tout le corpus, une loi à la fois."""
+    for key, law in iter_json_laws(json_root):
+        yield from ChunkBuilder(key, law, max_tokens)
+
+# === 3. EXPORT JSONL PAR LOTS ===
+def write_batch(out_dir: Path, number: int, chunks: List[Dict[str, Any]]) -> Path:
+    # Renommage atomique : un lot visible est toujours complet
+    path = out_dir / f"chunks-{number:05d}.jsonl"
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")) + "\n")
+    tmp.replace(path)
+    return path
+
+def export_chunks(json_root: Path = JSON_ROOT, out_dir: Path = CHUNKS_DIR,
+                  max_tokens: int = MAX_TOKENS, batch_size: int = BATCH_SIZE) -> int:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("chunks-*.jsonl"):
+        old.unlink()
+    batches = 0
+    total = 0
+    batch: List[Dict[str, Any]] = []
+    for chunk in iter_chunks(json_root, max_tokens):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            write_batch(out_dir, batches, batch)
+            batches += 1
+            total += len(batch)
+            batch = []
+    if batch:
+        write_batch(out_dir, batches, batch)
+        batches += 1
+        total += len(batch)
+    print(f"Morceaux RAG : {out_dir} | {total} morceaux | {batches} lots | "
+          f"≤ {max_tokens} mots par morceau")
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export des morceaux de recherche (RAG) en JSONL par lots.")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="budget par morceau, en mots")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="morceaux par fichier JSONL")
+    parser.add_argument("--out", type=Path, default=CHUNKS_DIR, help="dossier de sortie")
+    args = parser.parse_args()
+    export_chunks(out_dir=args.out, max_tokens=args.max_tokens, batch_size=args.batch_size)
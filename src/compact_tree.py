@@ -0,0 +1,312 @@
+# src/compact_tree.py
+import sys
+import json
+import mmap
+import argparse
+import tracemalloc
+from array import array
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT, LEVEL_ORDER, SECTION_MARKERS, iter_json_laws, node_context
+
+# === CONFIGURATION ===
+TREE_DIR = BASE_DIR / "corpus"
+TREE_META = TREE_DIR / "tree.json"
+TREE_DATA = TREE_DIR / "tree.bin"
+TREE_VERSION = 1
+
+# Types de nœuds codés sur un octet (indice dans LEVEL_ORDER)
+TYPE_CODES = {level: code for code, level in enumerate(LEVEL_ORDER)}
+NONE = -1
+
+# Un tableau `array` par champ ; les textes (intitulés, contenus, intros) sont
+# concaténés en UTF-8 dans un seul tampon et adressés par (début, longueur)
+# en octets. `marker` n'est pas stocké : il se déduit du type et du titre.
+NODE_ARRAYS = {
+    "type": "b", "number": "i", "position": "I",
+    "parent": "i", "first_child": "i", "next_sibling": "i",
+    "title_start": "I", "title_len": "I", "content_start": "I", "content_len": "I",
+}
+LAW_ARRAYS = {"first_node": "I", "node_count": "I", "intro_start": "I", "intro_len": "I"}
+
+# === 1. CONSTRUCTION DEPUIS LE JSON ===
+class TreeBuilder:
+    def __init__(self):
+        self.nodes = {name: array(code) for name, code in NODE_ARRAYS.items()}
+        self.laws = {name: array(code) for name, code in LAW_ARRAYS.items()}
+        self.headers: List[Dict[str, Any]] = []
+        self.text = bytearray()
+
+    def add_text(self, value: str):
+        data = value.encode("utf-8")
+        start = len(self.text)
+        self.text += data
+        return start, len(data)
+
+    def add_node(self, node: Dict[str, Any], parent: int, position: int) -> int:
+        index = len(self.nodes["type"])
+        title_start, title_len = self.add_text(node["title"])
+        content_start, content_len = self.add_text(node["content"])
+        for name, value in (("type", TYPE_CODES[node["type"]]), ("number", node["number"]), ("position", position),
+                            ("parent", parent), ("first_child", NONE), ("next_sibling", NONE),
+                            ("title_start", title_start), ("title_len", title_len),
+                            ("content_start", content_start), ("content_len", content_len)):
+            self.nodes[name].append(value)
+        return index
+
+    def add_law(self, key: str, law: Dict[str, Any]):
+        first = len(self.nodes["type"])
+        # Ordre préfixe : les nœuds d'une loi sont contigus, le sous-arbre d'un
+        # nœud aussi
+        stack = [(iter(enumerate(law["structure"])), NONE, NONE)]  # (enfants, parent, dernier frère)
+        while stack:
+            children, parent, previous = stack[-1]
+            item = next(children, None)
+            if item is None:
+                stack.pop()
+                continue
+            position, node = item
+            index = self.add_node(node, parent, position)
+            if previous != NONE:
+                self.nodes["next_sibling"][previous] = index
+            elif parent != NONE:
+                self.nodes["first_child"][parent] = index
+            stack[-1] = (children, parent, index)
+            if node["children"]:
+                stack.append((iter(enumerate(node["children"])), index, NONE))
+        intro_start, intro_len = self.add_text(law["intro"])
+        for name, value in (("first_node", first), ("node_count", len(self.nodes["type"]) - first),
+                            ("intro_start", intro_start), ("intro_len", intro_len)):
+            self.laws[name].append(value)
+        # Champs d'en-tête restants (titre, type, renvois...) dans leur ordre ;
+        # `context` se recalcule depuis l'arbre
+        self.headers.append({"key": key, "fields": {k: (None if k in ("intro", "structure", "context") else v)
+                                                    for k, v in law.items()}})
+
+    def build(self) -> "CompactCorpus":
+        return CompactCorpus(self.nodes, self.laws, self.headers, bytes(self.text))
+
+# === 2. CORPUS COMPACT ===
+class CompactCorpus:
+    """Tout le corpus en une dizaine de tableaux plats et un tampon de texte.
+    Un nœud est un entier ; les parcours suivent first_child/next_sibling
+    sans créer d'objet par nœud, et les textes ne sont décodés qu'à la
+    demande. Chargé depuis le disque, tout est projeté en mémoire (mmap) :
+    les pages sont partagées entre les workers."""
+
+    def __init__(self, nodes: Dict[str, Any], laws: Dict[str, Any], headers: List[Dict[str, Any]], text,
+                 closer=None):
+        self.nodes = nodes
+        self.laws = laws
+        self.headers = headers
+        self.text = text
+        self.keys = {header["key"]: i for i, header in enumerate(headers)}
+        self._closer = closer
+        for name in NODE_ARRAYS:
+            setattr(self, name, nodes[name])
+
+    @classmethod
+    def from_laws(cls, laws: Iterable[tuple]) -> "CompactCorpus":
+        builder = TreeBuilder()
+        for key, law in laws:
+            builder.add_law(key, law)
+        return builder.build()
+
+    def close(self):
+        if self._closer is not None:
+            self.nodes = self.laws = self.text = None
+            for name in NODE_ARRAYS:
+                setattr(self, name, None)
+            self._closer()
+            self._closer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.type)
+
+    # --- accès ---
+    def _str(self, start: int, length: int) -> str:
+        return str(self.text[start:start + length], "utf-8")
+
+    def node_type(self, node: int) -> str:
+        return LEVEL_ORDER[self.type[node]]
+
+    def title(self, node: int) -> str:
+        return self._str(self.title_start[node], self.title_len[node])
+
+    def content(self, node: int) -> str:
+        return self._str(self.content_start[node], self.content_len[node])
+
+    def marker(self, node: int) -> str:
+        left, right = SECTION_MARKERS[self.node_type(node)]
+        return f"{left} {self.title(node)} {right}"
+
+    def children(self, node: int) -> Iterator[int]:
+        child = self.first_child[node]
+        while child != NONE:
+            yield child
+            child = self.next_sibling[child]
+
+    def roots(self, law: int) -> Iterator[int]:
+        """Nœuds de premier niveau de la loi d'indice `law`."""
+        if not self.laws["node_count"][law]:
+            return
+        node = self.laws["first_node"][law]
+        while node != NONE:
+            yield node
+            node = self.next_sibling[node]
+
+    def ancestors(self, node: int) -> List[int]:
+        """Ancêtres de la racine vers le nœud (exclu)."""
+        chain = []
+        node = self.parent[node]
+        while node != NONE:
+            chain.append(node)
+            node = self.parent[node]
+        return chain[::-1]
+
+    def path(self, node: int) -> str:
+        """Chemin "0/3/1" du nœud, même convention que les index dérivés."""
+        return "/".join(str(self.position[n]) for n in self.ancestors(node) + [node])
+
+    def law_of(self, node: int) -> int:
+        # Les nœuds d'une loi sont contigus : recherche dichotomique
+        first = self.laws["first_node"]
+        low, high = 0, len(first) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if first[middle] <= node:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def law_nodes(self, law: int) -> range:
+        first = self.laws["first_node"][law]
+        return range(first, first + self.laws["node_count"][law])
+
+    def articles(self, key: str, number: int) -> List[int]:
+        law = self.keys.get(key)
+        if law is None:
+            return []
+        code = TYPE_CODES['مادة']
+        return [n for n in self.law_nodes(law) if self.type[n] == code and self.number[n] == number]
+
+    # --- retour au schéma JSON ---
+    def node_json(self, node: int) -> Dict[str, Any]:
+        return {"type": self.node_type(node), "title": self.title(node), "number": self.number[node],
+                "marker": self.marker(node), "content": self.content(node),
+                "children": [self.node_json(child) for child in self.children(node)]}
+
+    def to_law(self, key: str) -> Optional[Dict[str, Any]]:
+        """La loi au format JSON d'origine (champs dans le même ordre)."""
+        law = self.keys.get(key)
+        if law is None:
+            return None
+        result = dict(self.headers[law]["fields"])
+        if "intro" in result:
+            result["intro"] = self._str(self.laws["intro_start"][law], self.laws["intro_len"][law])
+        if "structure" in result:
+            result["structure"] = [self.node_json(root) for root in self.roots(law)]
+        if "context" in result:
+            result["context"] = node_context(result["intro"], result["structure"])
+        return result
+
+    def iter_laws(self) -> Iterator[tuple]:
+        for header in self.headers:
+            yield header["key"], self.to_law(header["key"])
+
+    # --- persistance ---
+    def save(self, meta_path: Path = TREE_META, data_path: Path = TREE_DATA):
+        """tree.bin : tableaux puis tampon de texte, alignés sur 8 octets ;
+        tree.json : emplacement de chaque tableau et en-têtes des lois."""
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        layout = {}
+        tmp_data = data_path.with_name(data_path.name + ".tmp")
+        with open(tmp_data, "wb") as f:
+            for group, arrays in (("nodes", self.nodes), ("laws", self.laws)):
+                for name, values in arrays.items():
+                    f.write(b"\0" * (-f.tell() % 8))
+                    layout[f"{group}.{name}"] = [values.typecode, f.tell(), len(values)]
+                    f.write(values.tobytes())
+            layout["text"] = ["B", f.tell(), len(self.text)]
+            f.write(self.text)
+        meta = {"version": TREE_VERSION, "byteorder": sys.byteorder, "layout": layout, "laws": self.headers}
+        tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+        tmp_meta.write_text(json.dumps(meta, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp_data.replace(data_path)
+        tmp_meta.replace(meta_path)
+
+    @classmethod
+    def load(cls, meta_path: Path = TREE_META, data_path: Path = TREE_DATA) -> "CompactCorpus":
+        if not (meta_path.exists() and data_path.exists()):
+            raise FileNotFoundError(f"Arbre compact introuvable : {meta_path} (lancer compact_tree.py)")
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("version") != TREE_VERSION or meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Arbre compact incompatible : {meta_path}")
+        f = open(data_path, "rb")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        # Vues typées sur la projection : aucune copie
+        arrays = {"nodes": {}, "laws": {}}
+        for name, (code, offset, count) in meta["layout"].items():
+            size = array(code).itemsize
+            part = view[offset:offset + count * size]
+            if name == "text":
+                text = part
+            else:
+                group, field = name.split(".")
+                arrays[group][field] = part.cast(code)
+        views = [text, *arrays["nodes"].values(), *arrays["laws"].values(), view]
+
+        def closer():
+            for v in views:
+                v.release()
+            mapped.close()
+            f.close()
+
+        return cls(arrays["nodes"], arrays["laws"], meta["laws"], text, closer)
+
+def build_tree(json_root: Path = JSON_ROOT) -> CompactCorpus:
+    corpus = CompactCorpus.from_laws(iter_json_laws(json_root))
+    corpus.save()
+    print(f"Arbre compact : {TREE_DATA.relative_to(BASE_DIR)} | {len(corpus.headers)} lois | {len(corpus)} nœuds | "
+          f"{TREE_DATA.stat().st_size / 1e6:.1f} Mo")
+    return corpus
+
+# === 3. VÉRIFICATION ET MESURE ===
+def traced(fn):
+    tracemalloc.start()
+    result = fn()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, current
+
+def compare(json_root: Path = JSON_ROOT) -> bool:
+    """Aller-retour JSON → compact → JSON identique pour chaque loi, et
+    mémoire occupée par les deux représentations."""
+    laws, dict_bytes = traced(lambda: list(iter_json_laws(json_root)))
+    compact, compact_bytes = traced(lambda: CompactCorpus.from_laws(laws))
+    mismatches = [key for key, law in laws if compact.to_law(key) != law]
+    loaded, mapped_bytes = traced(CompactCorpus.load)
+    loaded.close()
+    print(f"Dictionnaires : {dict_bytes / 1e6:.1f} Mo | compact en mémoire : {compact_bytes / 1e6:.1f} Mo | "
+          f"compact projeté (mmap) : {mapped_bytes / 1e6:.2f} Mo hors pages partagées")
+    print(f"Aller-retour : {len(laws) - len(mismatches)}/{len(laws)} lois identiques")
+    for key in mismatches:
+        print(f"   ✗ {key}")
+    return not mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arbre compact du corpus (tableaux plats + tampon de texte).")
+    parser.add_argument("--check", action="store_true", help="vérifier l'aller-retour JSON et comparer la mémoire")
+    args = parser.parse_args()
+    build_tree()
+    if args.check:
+        sys.exit(0 if compare() else 1)
@@ -0,0 +1,216 @@
+# src/conversion_daemon.py
+import os
+import json
+import time
+import signal
+import asyncio
+import argparse
+from pathlib import Path
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from batch_clean_and_convert import (
+    INPUT_ROOT, convert_text, process_file, file_hash, load_manifest, save_manifest, manifest_entry,
+)
+
+# === CONFIGURATION ===
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BODY = 32 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+# === 1. TRAVAIL CPU (PROCESSUS DU POOL) ===
+# Les règles compilées vivent au niveau du module : chaque processus du pool
+# les compile une fois à l'import, puis les réutilise pour toutes les requêtes.
+def warm_up() -> int:
+    convert_text("المادة 1 نص", "échauffement")
+    return os.getpid()
+
+# === 2. HTTP MINIMAL AU-DESSUS D'ASYNCIO ===
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+async def read_line(reader: asyncio.StreamReader, status: int, what: str) -> bytes:
+    # Au-delà de la limite du StreamReader (64 Kio), readline() lève
+    # ValueError : on répond au client au lieu de couper la connexion
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HttpError(status, f"{what} trop longue")
+
+async def read_request(reader: asyncio.StreamReader):
+    request_line = await read_line(reader, 400, "ligne de requête")
+    if not request_line:
+        return None
+    try:
+        # Cible en UTF-8 : les clients n'encodent pas toujours les chemins arabes
+        method, target, _ = request_line.decode("utf-8", errors="replace").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "ligne de requête invalide")
+    headers = {}
+    while True:
+        line = await read_line(reader, 431, "ligne d'en-tête")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    # Chiffres ASCII seulement : int() accepterait aussi "-1", "1_000" ou " +5"
+    value = headers.get("content-length") or "0"
+    if not (value.isascii() and value.isdigit()):
+        raise HttpError(400, f"en-tête Content-Length invalide : {value!r}")
+    length = int(value)
+    if length > MAX_BODY:
+        raise HttpError(413, f"corps limité à {MAX_BODY} octets")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+def write_response(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+
+# === 3. SERVICE ===
+class ConversionService:
+    """Reçoit du texte OCR brut et renvoie la loi en JSON (POST /convert), ou
+    l'ajoute au corpus et la convertit aussitôt (POST /ingest)."""
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.manifest_lock = asyncio.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.failures = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Démarre tous les processus et compile les règles avant la 1re requête
+        pids = await asyncio.gather(*(loop.run_in_executor(self.pool, warm_up) for _ in range(self.workers)))
+        print(f"{len(set(pids))} processus prêts")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def run_cpu(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, partial(fn, *args))
+
+    async def convert(self, query: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        raw = body.decode("utf-8", errors="ignore")
+        return await self.run_cpu(convert_text, raw, query.get("title", "sans titre"))
+
+    async def ingest(self, query: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        """Un fichier déjà présent sous text/ n'est remplacé qu'avec overwrite=1."""
+        rel = query.get("path", "")
+        txt_file = (INPUT_ROOT / rel).resolve()
+        if not rel.endswith(".txt") or INPUT_ROOT.resolve() not in txt_file.parents:
+            raise HttpError(400, "paramètre path : chemin .txt relatif à text/ attendu")
+        overwrite = query.get("overwrite", "0") == "1"
+        start = time.perf_counter()
+        txt_file.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # Création exclusive : deux ingestions du même chemin ne s'écrasent pas
+            with open(txt_file, "wb" if overwrite else "xb") as f:
+                f.write(body)
+        except FileExistsError:
+            raise HttpError(409, f"{rel} existe déjà dans text/ (overwrite=1 pour le remplacer)")
+        txt_file = INPUT_ROOT / txt_file.relative_to(INPUT_ROOT.resolve())
+        result = await self.run_cpu(process_file, txt_file)
+        if result["status"] != "ok":
+            raise HttpError(500, result["error"] or result["status"])
+        # Le manifeste est partagé : une seule mise à jour à la fois
+        async with self.manifest_lock:
+            manifest = load_manifest()
+            entry = manifest_entry(txt_file, file_hash(txt_file))
+            manifest["files"][txt_file.relative_to(INPUT_ROOT).as_posix()] = entry
+            save_manifest(manifest)
+        return {"json": entry["json"], "clean": entry["clean"], "metrics": result["metrics"],
+                "seconds": round(time.perf_counter() - start, 4)}
+
+    def health(self) -> Dict[str, Any]:
+        return {"status": "ok", "workers": self.workers, "requests": self.requests, "failures": self.failures,
+                "uptime": round(time.monotonic() - self.started, 1)}
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Dict[str, Any]:
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        routes = {("GET", "/health"): None, ("POST", "/convert"): self.convert, ("POST", "/ingest"): self.ingest}
+        if (method, url.path) not in routes:
+            known = any(path == url.path for _, path in routes)
+            raise HttpError(405 if known else 404, f"{method} {url.path}")
+        if url.path == "/health":
+            return self.health()
+        return await routes[(method, url.path)](query, body)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as e:
+                    write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.requests += 1
+                try:
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                if status != 200:
+                    self.failures += 1
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+async def serve(host: str = HOST, port: int = PORT, unix_socket: Optional[Path] = None, workers: int = 0):
+    service = ConversionService(workers)
+    await service.start()
+    if unix_socket is not None:
+        unix_socket.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(service.handle, path=str(unix_socket))
+        where = f"unix:{unix_socket}"
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        where = f"http://{host}:{port}"
+    print(f"Service de conversion : {where} | POST /convert, POST /ingest?path=…[&overwrite=1], GET /health")
+    # Arrêt propre sur SIGINT/SIGTERM : fermeture du serveur puis du pool
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        service.close()
+        if unix_socket is not None:
+            unix_socket.unlink(missing_ok=True)
+        print("Service arrêté")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service local de conversion (texte OCR → JSON).")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", type=Path, metavar="SOCKET", help="écouter sur un socket Unix plutôt qu'en TCP")
+    parser.add_argument("-j", "--workers", type=int, default=0, help="processus de conversion (0 = tous les cœurs)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.unix, args.workers))
@@ -0,0 +1,140 @@
+# src/corpus_index.py
+import sys
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT, iter_json_laws, resolve_alias
+
+# === CONFIGURATION ===
+INDEX_DB = BASE_DIR / "corpus" / "corpus.sqlite3"
+
+SCHEMA = """
+CREATE TABLE laws (
+    id          INTEGER PRIMARY KEY,
+    key         TEXT NOT NULL UNIQUE,
+    title       TEXT NOT NULL,
+    type        TEXT,
+    intro       TEXT,
+    source_path TEXT
+);
+CREATE TABLE nodes (
+    id        INTEGER PRIMARY KEY,
+    law_id    INTEGER NOT NULL REFERENCES laws(id),
+    parent_id INTEGER REFERENCES nodes(id),
+    path      TEXT NOT NULL,
+    position  INTEGER NOT NULL,
+    type      TEXT NOT NULL,
+    number    INTEGER,
+    title     TEXT NOT NULL,
+    content   TEXT
+);
+-- Copies dédoublonnées (renvois "ref") : clé de la copie → loi stockée
+CREATE TABLE aliases (
+    key    TEXT PRIMARY KEY,
+    law_id INTEGER NOT NULL REFERENCES laws(id)
+);
+CREATE INDEX laws_title ON laws(title);
+CREATE INDEX laws_source_path ON laws(source_path);
+CREATE UNIQUE INDEX nodes_law_path ON nodes(law_id, path);
+CREATE INDEX nodes_law_type_number ON nodes(law_id, type, number);
+CREATE INDEX nodes_parent ON nodes(parent_id);
+"""
+
+# === 1. CONSTRUCTION ===
+def law_rows(law_id: int, law: Dict[str, Any], first_id: int):
+    """Lignes `nodes` d'une loi ; les identifiants sont attribués ici pour que
+    chaque enfant connaisse celui de son parent sans relecture."""
+    rows = []
+    stack = [(law["structure"], "", None)]
+    while stack:
+        nodes, prefix, parent_id = stack.pop()
+        for position, node in enumerate(nodes):
+            node_id = first_id + len(rows)
+            path = f"{prefix}{position}"
+            rows.append((node_id, law_id, parent_id, path, position, node["type"],
+                         node["number"], node["title"], node["content"]))
+            if node["children"]:
+                stack.append((node["children"], path + "/", node_id))
+    return rows
+
+def build_index(json_root: Path = JSON_ROOT, db_path: Path = INDEX_DB):
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;")
+    conn.executescript(SCHEMA)
+    laws = []
+    nodes = []
+    references: Dict[str, str] = {}
+    for law_id, (key, law) in enumerate(iter_json_laws(json_root, aliases=references), start=1):
+        laws.append((law_id, key, law["title"], law.get("type"), law.get("intro"), law.get("source_path")))
+        nodes.extend(law_rows(law_id, law, len(nodes) + 1))
+    ids = {row[1]: row[0] for row in laws}
+    aliases = [(key, ids[resolve_alias(references, key)]) for key in references
+               if resolve_alias(references, key) in ids]
+    # Une seule transaction pour tout le corpus
+    with conn:
+        conn.executemany("INSERT INTO laws VALUES (?, ?, ?, ?, ?, ?)", laws)
+        conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", nodes)
+        conn.executemany("INSERT INTO aliases VALUES (?, ?)", aliases)
+    conn.execute("ANALYZE")
+    conn.close()
+    tmp_path.replace(db_path)
+
+    articles = sum(1 for row in nodes if row[5] == "مادة")
+    print(f"Index SQLite : {db_path.relative_to(BASE_DIR)} | {len(laws)} lois | {len(nodes)} nœuds | {articles} مادة | "
+          f"{len(aliases)} copies")
+
+# === 2. REQUÊTES ===
+def connect(db_path: Path = INDEX_DB) -> sqlite3.Connection:
+    if not db_path.exists():
+        raise FileNotFoundError(f"Index introuvable : {db_path} (lancer corpus_index.py)")
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def find_law(conn: sqlite3.Connection, law: str) -> Optional[sqlite3.Row]:
+    """Loi par clé (chemin sous json/, ou celui d'une copie dédoublonnée),
+    titre ou chemin source."""
+    for query in ("SELECT * FROM laws WHERE key = ?",
+                  "SELECT laws.* FROM aliases JOIN laws ON laws.id = aliases.law_id WHERE aliases.key = ?",
+                  "SELECT * FROM laws WHERE title = ?",
+                  "SELECT * FROM laws WHERE source_path = ?"):
+        row = conn.execute(query, (law,)).fetchone()
+        if row is not None:
+            return row
+    return None
+
+def get_articles(conn: sqlite3.Connection, law: str, number: int) -> List[sqlite3.Row]:
+    row = find_law(conn, law)
+    if row is None:
+        return []
+    return conn.execute(
+        "SELECT * FROM nodes WHERE law_id = ? AND type = 'مادة' AND number = ? ORDER BY id",
+        (row["id"], number),
+    ).fetchall()
+
+def get_children(conn: sqlite3.Connection, node_id: int) -> List[sqlite3.Row]:
+    return conn.execute("SELECT * FROM nodes WHERE parent_id = ? ORDER BY position", (node_id,)).fetchall()
+
+def get_ancestors(conn: sqlite3.Connection, node_id: int) -> List[sqlite3.Row]:
+    """Ancêtres de la racine vers le nœud (exclu)."""
+    return conn.execute(
+        "WITH RECURSIVE up(id, parent_id, depth) AS ("
+        " SELECT id, parent_id, 0 FROM nodes WHERE id = ?"
+        " UNION ALL SELECT n.id, n.parent_id, up.depth + 1 FROM nodes n JOIN up ON n.id = up.parent_id)"
+        " SELECT nodes.* FROM up JOIN nodes ON nodes.id = up.id WHERE up.depth > 0 ORDER BY up.depth DESC",
+        (node_id,),
+    ).fetchall()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        # python src/corpus_index.py "<loi>" <numéro de مادة>
+        conn = connect()
+        for article in get_articles(conn, sys.argv[1], int(sys.argv[2])):
+            print(f"{article['title']}\n{article['content']}\n")
+    else:
+        build_index()
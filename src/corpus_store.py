@@ -0,0 +1,184 @@
+# src/corpus_store.py
+import json
+import mmap
+import sys
+import time
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT, SECTION_MARKERS, iter_json_laws, node_context
+
+# === CONFIGURATION ===
+STORE_DIR = BASE_DIR / "corpus"
+STORE_PATH = STORE_DIR / "store.jsonl"
+INDEX_PATH = STORE_DIR / "store.idx.json"
+STORE_VERSION = 2
+# Lecteur ouvert pendant un export : le stock et l'index sont remplacés l'un
+# après l'autre, ils sont rouverts jusqu'à ce que les générations concordent
+OPEN_RETRIES = 20
+OPEN_RETRY_DELAY = 0.05
+
+# === 1. APLATISSEMENT D'UNE LOI ===
+# Un enregistrement par nœud, sans `marker` (reconstruit depuis type + titre)
+# ni `children` (remplacé par le nombre d'enfants). Le chemin d'un nœud est la
+# suite des positions depuis la racine : "0/3/1". L'enregistrement de la loi
+# porte tous les champs d'en-tête et leur ordre (`fields`) ; `context` se
+# recalcule depuis l'arbre et n'est pas stocké.
+def flatten_law(key: str, law: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    header = {k: v for k, v in law.items() if k not in ("structure", "context")}
+    yield {"law": key, "path": "", **header, "fields": list(law), "children": len(law["structure"])}
+    stack = [(law["structure"], "", None)]
+    while stack:
+        nodes, prefix, parent = stack.pop()
+        pending = []
+        for i, node in enumerate(nodes):
+            path = f"{prefix}{i}"
+            yield {
+                "law": key, "path": path, "parent": parent, "type": node["type"],
+                "title": node["title"], "number": node["number"], "content": node["content"],
+                "children": len(node["children"]),
+            }
+            if node["children"]:
+                pending.append((node["children"], path + "/", path))
+        stack.extend(reversed(pending))
+
+# === 2. EXPORT ===
+def export_store(json_root: Path = JSON_ROOT, store_path: Path = STORE_PATH, index_path: Path = INDEX_PATH):
+    """Le stock finit par une ligne {"generation": empreinte de son contenu},
+    reprise dans l'index avec sa position : un lecteur vérifie à l'ouverture
+    que l'index décrit bien le stock qu'il a ouvert (voir CorpusStore)."""
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    index = {"version": STORE_VERSION, "laws": {}}
+    tmp_store = store_path.with_suffix(".tmp")
+    digest = hashlib.sha1()
+    offset = 0
+    nodes = 0
+
+    with open(tmp_store, "wb") as out:
+        for key, law in iter_json_laws(json_root):
+            entry = {"nodes": {}, "articles": {}}
+            for record in flatten_law(key, law):
+                data = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                out.write(data)
+                digest.update(data)
+                entry["nodes"][record["path"]] = [offset, len(data) - 1]
+                if record["type"] == "مادة":
+                    entry["articles"].setdefault(str(record["number"]), []).append(record["path"])
+                offset += len(data)
+                nodes += 1
+            index["laws"][key] = entry
+        index["generation"] = digest.hexdigest()
+        trailer = json.dumps({"generation": index["generation"]}).encode("utf-8")
+        out.write(trailer + b"\n")
+        index["trailer"] = [offset, len(trailer)]
+
+    tmp_index = index_path.with_suffix(".tmp")
+    tmp_index.write_text(json.dumps(index, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    # Deux remplacements atomiques mais pas un seul : entre les deux, un
+    # lecteur voit un stock et un index de générations différentes et les
+    # rouvre.
+    tmp_store.replace(store_path)
+    tmp_index.replace(index_path)
+
+    print(f"Stock compact : {store_path.relative_to(BASE_DIR)} | {len(index['laws'])} lois | {nodes} nœuds | {offset / 1024:.0f} Ko")
+    return index
+
+# === 3. LECTURE PARESSEUSE ===
+class CorpusStore:
+    """Lecteur du stock : le fichier est projeté en mémoire (mmap), partagé
+    entre processus par le cache du système, et seuls les enregistrements
+    demandés sont décodés."""
+
+    def __init__(self, store_path: Path = STORE_PATH, index_path: Path = INDEX_PATH):
+        if not store_path.exists() or not index_path.exists():
+            raise FileNotFoundError(f"Stock introuvable : {store_path} (lancer corpus_store.py)")
+        for _ in range(OPEN_RETRIES):
+            self._file = open(store_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.index = json.loads(index_path.read_text(encoding="utf-8"))
+            if self.index.get("version") != STORE_VERSION:
+                self.close()
+                raise ValueError(f"Version de stock incompatible : {self.index.get('version')}")
+            if self._generation() == self.index["generation"]:
+                return
+            # Export en cours entre les deux remplacements : on rouvre le tout
+            self.close()
+            time.sleep(OPEN_RETRY_DELAY)
+        raise ValueError(f"Stock et index de générations différentes : {store_path} (relancer corpus_store.py)")
+
+    def _generation(self) -> Optional[str]:
+        try:
+            return self._decode(self.index["trailer"]).get("generation")
+        except (ValueError, AttributeError):
+            return None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _decode(self, span) -> Dict[str, Any]:
+        offset, length = span
+        return json.loads(self._map[offset:offset + length].decode("utf-8"))
+
+    def laws(self) -> List[str]:
+        return list(self.index["laws"])
+
+    def law(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.node(key, "")
+
+    def node(self, key: str, path: str) -> Optional[Dict[str, Any]]:
+        span = self.index["laws"].get(key, {}).get("nodes", {}).get(path)
+        return self._decode(span) if span else None
+
+    def children(self, key: str, path: str = "") -> List[Dict[str, Any]]:
+        parent = self.node(key, path)
+        if parent is None:
+            return []
+        prefix = f"{path}/" if path else ""
+        return [self.node(key, f"{prefix}{i}") for i in range(parent["children"])]
+
+    def articles(self, key: str, number: int) -> List[Dict[str, Any]]:
+        """Toutes les مادة de numéro `number` (plusieurs possibles : مكرر, doublons OCR)."""
+        paths = self.index["laws"].get(key, {}).get("articles", {}).get(str(number), [])
+        return [self.node(key, path) for path in paths]
+
+    def load_law(self, key: str) -> Optional[Dict[str, Any]]:
+        """Reconstruit la loi au format JSON d'origine (marqueurs compris)."""
+        header = self.law(key)
+        if header is None:
+            return None
+
+        def build(path: str, count: int) -> List[Dict[str, Any]]:
+            prefix = f"{path}/" if path else ""
+            nodes = []
+            for i in range(count):
+                record = self.node(key, f"{prefix}{i}")
+                left, right = SECTION_MARKERS[record["type"]]
+                nodes.append({
+                    "type": record["type"], "title": record["title"], "number": record["number"],
+                    "marker": f"{left} {record['title']} {right}", "content": record["content"],
+                    "children": build(record["path"], record["children"]),
+                })
+            return nodes
+
+        law = {name: header.get(name) for name in header["fields"]}
+        law["structure"] = build("", header["children"])
+        if "context" in law:
+            law["context"] = node_context(law["intro"], law["structure"])
+        return law
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--get":
+        # python src/corpus_store.py --get "<clé de la loi>" <numéro de مادة>
+        with CorpusStore() as store:
+            for article in store.articles(sys.argv[2], int(sys.argv[3])):
+                print(f"{article['title']}\n{article['content']}\n")
+    else:
+        export_store()
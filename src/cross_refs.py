@@ -0,0 +1,207 @@
+# src/cross_refs.py
+import re
+import sys
+import json
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from batch_clean_and_convert import (
+    BASE_DIR, JSON_ROOT, CONSTITUTION, iter_json_laws, extract_references, fold_reference_text, node_headings,
+)
+
+# === CONFIGURATION ===
+REFS_PATH = BASE_DIR / "corpus" / "references.json"
+REFS_VERSION = 1
+# Début de l'intro examiné quand le titre ne donne pas le numéro de la loi
+INTRO_HEAD = 400
+
+# Numéro propre d'un texte : le premier "رقم" de son intitulé, et le texte
+# qu'il promulgue ("ظهير شريف رقم 1.15.83 بتنفيذ القانون التنظيمي رقم 111.14").
+# Les textes cités autrement ("بتطبيق القانون رقم 28.08") ne sont pas retenus.
+LAW_NUMBER_RE = re.compile(r'رقم\s*(\d+(?:[.\-]\d+)+)')
+PROMULGATED_RE = re.compile(r'بتنفيذ\s*(?:نص\s*)?(?:ال)?(?:قانون|ظهير|مرسوم)[^.؛]{0,40}?رقم\s*(\d+(?:[.\-]\d+)+)')
+
+# Identifiants : "<clé de la loi>#<chemin>" pour un nœud (même convention que
+# chunks.py), la clé seule pour la loi quand l'article visé n'y est pas isolé.
+def node_id(key: str, path: str) -> str:
+    return f"{key}#{path}"
+
+def own_numbers(text: str) -> List[str]:
+    text = fold_reference_text(text)
+    numbers = []
+    first = LAW_NUMBER_RE.search(text)
+    if first:
+        numbers.append(first.group(1))
+    numbers.extend(match.group(1) for match in PROMULGATED_RE.finditer(text))
+    return [number.replace('-', '.') for number in dict.fromkeys(numbers)]
+
+# === 1. TABLES DU CORPUS ===
+class CorpusTables:
+    """Numéros de lois → clé, et pour chaque loi (type, numéro) → chemins des
+    nœuds ; un article dont l'intitulé est resté dans le contenu d'un autre
+    nœud est rattaché à ce nœud. Un numéro tiré d'un titre l'emporte sur un
+    numéro tiré d'une intro ; à égalité, la première loi (ordre des chemins)
+    l'emporte."""
+
+    def __init__(self):
+        self.by_number: Dict[str, str] = {}
+        self.from_intro: set = set()
+        self.nodes: Dict[str, Dict[tuple, List[str]]] = {}
+        self.embedded: Dict[str, Dict[tuple, List[str]]] = {}
+        self.constitution: Optional[str] = None
+
+    def add_law(self, key: str, law: Dict[str, Any]):
+        numbers = own_numbers(law["title"])
+        for number in numbers:
+            if number not in self.by_number or number in self.from_intro:
+                self.by_number[number] = key
+                self.from_intro.discard(number)
+        if not numbers:
+            for number in own_numbers(law.get("intro", "")[:INTRO_HEAD]):
+                if number not in self.by_number:
+                    self.by_number[number] = key
+                    self.from_intro.add(number)
+        if self.constitution is None and law["title"].startswith(CONSTITUTION):
+            self.constitution = key
+
+        nodes: Dict[tuple, List[str]] = {}
+        embedded: Dict[tuple, List[str]] = {}
+        stack = [(law["structure"], "")]
+        while stack:
+            children, prefix = stack.pop()
+            pending = []
+            for i, node in enumerate(children):
+                path = f"{prefix}{i}"
+                nodes.setdefault((node["type"], node["number"]), []).append(path)
+                for heading in node_headings(f"{node['title']} {node['content']}"):
+                    embedded.setdefault(heading, []).append(path)
+                if node["children"]:
+                    pending.append((node["children"], path + "/"))
+            stack.extend(reversed(pending))
+        self.nodes[key] = nodes
+        self.embedded[key] = embedded
+
+    def target_law(self, key: str, law: Optional[str]) -> Optional[str]:
+        if law is None:
+            return key
+        if law == CONSTITUTION:
+            return self.constitution
+        return self.by_number.get(law)
+
+    def resolve(self, key: str, source: str, ref: Dict[str, Any]) -> List[str]:
+        """Identifiants visés par un renvoi ; [] s'il vise un texte absent du
+        corpus. Dans la loi elle-même, parmi plusieurs nœuds de même numéro,
+        le plus proche du nœud source dans l'arbre est retenu."""
+        target = self.target_law(key, ref["law"])
+        if target is None:
+            return []
+        nodes = self.nodes[target]
+        embedded = self.embedded[target]
+        ids = []
+        for number in ref["numbers"]:
+            paths = nodes.get((ref["type"], number), [])
+            if target == key:
+                # L'intitulé peut être resté dans le nœud source lui-même
+                paths = [p for p in paths if p != source] or embedded.get((ref["type"], number), [])
+                if paths:
+                    ids.append(node_id(key, max(paths, key=lambda p: shared_depth(p, source))))
+            else:
+                paths = paths or embedded.get((ref["type"], number), [])
+                ids.append(node_id(target, paths[0]) if paths else target)
+        return ids
+
+def shared_depth(a: str, b: str) -> int:
+    depth = 0
+    for x, y in zip(a.split("/"), b.split("/")):
+        if x != y:
+            break
+        depth += 1
+    return depth
+
+# === 2. CONSTRUCTION DU GRAPHE ===
+def build_reference_graph(json_root: Path = JSON_ROOT, path: Path = REFS_PATH) -> "ReferenceGraph":
+    """Deux passes sur les lois converties : la première recense numéros et
+    nœuds, la seconde résout les renvois relevés à la conversion (clé
+    "references" ; recalculés pour un JSON antérieur qui n'en a pas)."""
+    tables = CorpusTables()
+    laws = []
+    for key, law in iter_json_laws(json_root):
+        tables.add_law(key, law)
+        refs = law.get("references")
+        laws.append((key, refs if refs is not None else extract_references(law["structure"])))
+
+    forward: Dict[str, List[str]] = {}
+    mentions = unresolved = 0
+    for key, refs in laws:
+        for ref in refs:
+            mentions += 1
+            targets = tables.resolve(key, ref["from"], ref)
+            if not targets:
+                unresolved += 1
+                continue
+            source = node_id(key, ref["from"])
+            edges = forward.setdefault(source, [])
+            edges.extend(t for t in targets if t not in edges and t != source)
+            if not edges:
+                del forward[source]
+
+    graph = ReferenceGraph(forward, ReferenceGraph.invert(forward), tables.by_number)
+    graph.save(path)
+    print(f"Renvois : {path.relative_to(BASE_DIR)} | {mentions} renvois relevés | {mentions - unresolved} résolus | "
+          f"{sum(len(v) for v in forward.values())} arcs | {len(graph.reverse)} nœuds cités")
+    return graph
+
+# === 3. CONSULTATION ===
+class ReferenceGraph:
+    """Adjacence dans les deux sens : `cites` (ce que le nœud vise) et
+    `cited_by` (ce qui le vise) sont de simples lectures de dictionnaire."""
+
+    def __init__(self, forward: Dict[str, List[str]], reverse: Dict[str, List[str]], laws: Dict[str, str]):
+        self.forward = forward
+        self.reverse = reverse
+        self.laws = laws
+
+    @staticmethod
+    def invert(forward: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        reverse: Dict[str, List[str]] = {}
+        for source, targets in forward.items():
+            for target in targets:
+                reverse.setdefault(target, []).append(source)
+        return reverse
+
+    def cites(self, node: str) -> List[str]:
+        return self.forward.get(node, [])
+
+    def cited_by(self, node: str) -> List[str]:
+        return self.reverse.get(node, [])
+
+    def save(self, path: Path = REFS_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": REFS_VERSION, "laws": self.laws, "forward": self.forward, "reverse": self.reverse}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = REFS_PATH) -> "ReferenceGraph":
+        if not path.exists():
+            raise FileNotFoundError(f"Graphe des renvois introuvable : {path} (lancer cross_refs.py --build)")
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != REFS_VERSION:
+            raise ValueError(f"Graphe des renvois incompatible : {path}")
+        return cls(data["forward"], data["reverse"], data["laws"])
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--build":
+        build_reference_graph()
+    elif len(sys.argv) > 1:
+        # python src/cross_refs.py "<clé de la loi>#<chemin>" (ou la clé seule)
+        graph = ReferenceGraph.load()
+        for node in sys.argv[1:]:
+            print(node)
+            for target in graph.cites(node):
+                print(f"   → {target}")
+            for source in graph.cited_by(node):
+                print(f"   ← {source}")
+    else:
+        print("Usage : python src/cross_refs.py --build | python src/cross_refs.py <clé>#<chemin>")
@@ -0,0 +1,322 @@
+# src/law_versions.py
+import re
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from difflib import SequenceMatcher
+from typing import List, Dict, Any, Iterator, Optional
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT, iter_json_laws, node_context
+
+# === CONFIGURATION ===
+VERSIONS_DIR = BASE_DIR / "corpus" / "versions"
+VERSIONS_INDEX = VERSIONS_DIR / "index.json"
+VERSIONS_VERSION = 1
+
+# Les fichiers d'entrée finissent par un horodatage en millisecondes : une
+# version modifiée d'une loi arrive sous le même nom avec un autre suffixe.
+TIMESTAMP_RE = re.compile(r'-(\d{13})$')
+
+def split_version(key: str):
+    """Clé de loi ("dossier/nom-1707225933208") → (identifiant de la loi
+    sans horodatage, horodatage ou 0)."""
+    match = TIMESTAMP_RE.search(key)
+    if not match:
+        return key, 0
+    law_id = key[:match.start()].replace('ـ', '')
+    return re.sub(r'\s+', ' ', law_id).strip(), int(match.group(1))
+
+def law_digest(law: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(law, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+# === 1. LOI ⇄ SUITE DE NŒUDS ===
+# Une version est un en-tête (champs hors `structure`, dans leur ordre) et la
+# liste des nœuds en ordre préfixe, `children` remplacé par le nombre
+# d'enfants : une modification d'article ne touche que quelques éléments.
+# `context` se déduit de l'intro et de la structure : il n'est pas stocké
+# (gardé dans l'en-tête comme simple emplacement) et recalculé par assemble.
+DERIVED_FIELDS = ("structure", "context")
+
+def law_header(law: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: (None if k in DERIVED_FIELDS else v) for k, v in law.items()}
+
+def flatten_nodes(structure: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    records = []
+    stack = [iter(structure)]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            continue
+        records.append({k: (len(v) if k == "children" else v) for k, v in node.items()})
+        if node["children"]:
+            stack.append(iter(node["children"]))
+    return records
+
+def build_nodes(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    root: List[Dict[str, Any]] = []
+    stack = [(root, float("inf"))]  # (liste à remplir, enfants attendus)
+    for record in records:
+        while len(stack[-1][0]) == stack[-1][1]:
+            stack.pop()
+        node = dict(record, children=[])
+        stack[-1][0].append(node)
+        if record["children"]:
+            stack.append((node["children"], record["children"]))
+    return root
+
+def assemble(header: Dict[str, Any], records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    law = dict(header)
+    law["structure"] = build_nodes(records)
+    if "context" in law:
+        law["context"] = node_context(law["intro"], law["structure"])
+    return law
+
+# === 2. DELTAS ===
+# Les longs textes de l'en-tête (l'intro peut faire des dizaines de Ko) sont
+# comparés phrase par phrase ; le découpage garde les séparateurs, "".join
+# rend le texte exact.
+TEXT_UNIT_RE = re.compile(r'(?<=[.؛:])')
+TEXT_DELTA_MIN = 1024
+
+def text_units(text: str) -> List[str]:
+    return TEXT_UNIT_RE.split(text)
+
+def signature(item: Any) -> str:
+    return json.dumps(item, ensure_ascii=False, sort_keys=True)
+
+def sequence_delta(old: List[Any], new: List[Any]) -> List[list]:
+    """Opérations pour passer de `old` à `new` : ["copy", début, fin] reprend
+    une tranche de l'ancienne suite, ["add", [éléments]] en insère."""
+    matcher = SequenceMatcher(None, [signature(x) for x in old], [signature(x) for x in new], autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["copy", i1, i2])
+        elif j2 > j1:
+            ops.append(["add", new[j1:j2]])
+    return ops
+
+def apply_delta(old: List[Any], ops: List[list]) -> List[Any]:
+    new = []
+    for op in ops:
+        if op[0] == "copy":
+            new.extend(old[op[1]:op[2]])
+        else:
+            new.extend(op[1])
+    return new
+
+def header_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Champs modifiés de l'en-tête, chacun en delta si c'est une liste
+    (`references`) ou un long texte ; None si les champs eux-mêmes changent."""
+    if list(old) != list(new):
+        return None
+    fields = {}
+    for name, value in new.items():
+        before = old[name]
+        if value == before:
+            continue
+        if isinstance(value, list) and isinstance(before, list):
+            fields[name] = {"ops": sequence_delta(before, value)}
+        elif isinstance(value, str) and isinstance(before, str) and len(value) > TEXT_DELTA_MIN:
+            fields[name] = {"text": sequence_delta(text_units(before), text_units(value))}
+        else:
+            fields[name] = {"value": value}
+    return fields
+
+def apply_header_delta(header: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+    header = dict(header)
+    for name, change in fields.items():
+        if "ops" in change:
+            header[name] = apply_delta(header[name], change["ops"])
+        elif "text" in change:
+            header[name] = "".join(apply_delta(text_units(header[name]), change["text"]))
+        else:
+            header[name] = change["value"]
+    return header
+
+# === 3. STOCK VERSIONNÉ ===
+class VersionStore:
+    """Un journal JSONL par loi : la première version en entier, puis un
+    delta par version suivante (en-tête seulement s'il change). La dernière
+    version est aussi gardée en instantané (`.latest.json`) : la lecture
+    courante ne rejoue aucun delta, une version ancienne rejoue ceux qui la
+    précèdent."""
+
+    def __init__(self, root: Path = VERSIONS_DIR, index_path: Path = VERSIONS_INDEX):
+        self.root = root
+        self.index_path = index_path
+        self.index = {"version": VERSIONS_VERSION, "laws": {}}
+        if index_path.exists():
+            index = json.loads(index_path.read_text(encoding="utf-8"))
+            if index.get("version") == VERSIONS_VERSION:
+                self.index = index
+            else:
+                print(f"Stock de versions incompatible ({index.get('version')}), reconstruction complète")
+
+    def log_path(self, law_id: str) -> Path:
+        return self.root / (hashlib.sha1(law_id.encode("utf-8")).hexdigest()[:16] + ".jsonl")
+
+    def snapshot_path(self, law_id: str) -> Path:
+        return self.log_path(law_id).with_suffix(".latest.json")
+
+    def save_index(self):
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp.write_text(json.dumps(self.index, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(self.index_path)
+
+    def save_snapshot(self, law_id: str, law: Dict[str, Any]):
+        path = self.snapshot_path(law_id)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(law, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+
+    # --- écriture ---
+    def append(self, law_id: str, key: str, timestamp: int, law: Dict[str, Any],
+               previous: Optional[Dict[str, Any]]) -> int:
+        """Ajoute une version au journal ; renvoie le nombre d'octets écrits.
+        Le journal est d'abord ramené à la longueur connue de l'index : une
+        écriture interrompue est ainsi écrasée."""
+        entry = self.index["laws"].setdefault(law_id, {"log": self.log_path(law_id).name, "size": 0, "versions": []})
+        header = law_header(law)
+        records = flatten_nodes(law["structure"])
+        if previous is None:
+            record = {"timestamp": timestamp, "header": header, "nodes": records}
+        else:
+            record = {"timestamp": timestamp, "ops": sequence_delta(flatten_nodes(previous["structure"]), records)}
+            fields = header_delta(law_header(previous), header)
+            if fields is None:
+                record["header"] = header
+            elif fields:
+                record["fields"] = fields
+        data = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        path = self.root / entry["log"]
+        with open(path, "ab") as f:
+            f.truncate(entry["size"])
+            f.write(data)
+        entry["versions"].append({"key": key, "timestamp": timestamp, "hash": law_digest(law),
+                                  "offset": entry["size"], "length": len(data) - 1})
+        entry["size"] += len(data)
+        if previous is None:
+            # Version unique : le journal la contient déjà en entier
+            self.snapshot_path(law_id).unlink(missing_ok=True)
+        else:
+            self.save_snapshot(law_id, law)
+        return len(data)
+
+    def update(self, json_root: Path = JSON_ROOT) -> Dict[str, int]:
+        """Range chaque loi convertie sous son identifiant. Seules les versions
+        nouvelles sont écrites, en delta sur la précédente ; une loi dont une
+        version connue a changé (reconversion) ou qui reçoit une version plus
+        ancienne que la dernière est réécrite entièrement."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        grouped: Dict[str, List[tuple]] = {}
+        for key, law in iter_json_laws(json_root):
+            law_id, timestamp = split_version(key)
+            grouped.setdefault(law_id, []).append((timestamp, key, law))
+
+        stats = {"laws": len(grouped), "versions": 0, "appended": 0, "rewritten": 0, "bytes": 0, "full_bytes": 0}
+        for law_id, versions in grouped.items():
+            versions.sort(key=lambda v: (v[0], v[1]))
+            stats["versions"] += len(versions)
+            stored = self.index["laws"].get(law_id, {}).get("versions", [])
+            known = [(v["timestamp"], v["key"], v["hash"]) for v in stored]
+            current = [(t, k, law_digest(law)) for t, k, law in versions]
+            if current[:len(known)] != known:
+                self.index["laws"].pop(law_id, None)
+                stored = []
+                stats["rewritten"] += 1
+            previous = self.load(law_id) if stored else None
+            for timestamp, key, law in versions[len(stored):]:
+                stats["bytes"] += self.append(law_id, key, timestamp, law, previous)
+                stats["full_bytes"] += len(json.dumps(law, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                stats["appended"] += 1
+                previous = law
+
+        for law_id in set(self.index["laws"]) - set(grouped):
+            self.log_path(law_id).unlink(missing_ok=True)
+            self.snapshot_path(law_id).unlink(missing_ok=True)
+            del self.index["laws"][law_id]
+        self.save_index()
+        return stats
+
+    # --- lecture ---
+    def laws(self) -> List[str]:
+        return list(self.index["laws"])
+
+    def versions(self, law_id: str) -> List[Dict[str, Any]]:
+        return self.index["laws"].get(law_id, {}).get("versions", [])
+
+    def records(self, law_id: str, upto: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Enregistrements du journal jusqu'à la version d'indice `upto` incluse."""
+        entry = self.index["laws"][law_id]
+        versions = entry["versions"] if upto is None else entry["versions"][:upto + 1]
+        with open(self.root / entry["log"], "rb") as f:
+            for version in versions:
+                f.seek(version["offset"])
+                yield json.loads(f.read(version["length"]).decode("utf-8"))
+
+    def load(self, law_id: str, timestamp: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Loi dans la version `timestamp` (la dernière par défaut), au format
+        JSON d'origine."""
+        versions = self.versions(law_id)
+        if not versions:
+            return None
+        position = len(versions) - 1
+        if timestamp is not None:
+            matches = [i for i, v in enumerate(versions) if v["timestamp"] == timestamp]
+            if not matches:
+                return None
+            position = matches[-1]
+        if position == len(versions) - 1:
+            snapshot = self.snapshot_path(law_id)
+            if snapshot.exists():
+                law = json.loads(snapshot.read_text(encoding="utf-8"))
+                if law_digest(law) == versions[-1]["hash"]:
+                    return law
+        header, nodes = None, []
+        for record in self.records(law_id, position):
+            nodes = record["nodes"] if "nodes" in record else apply_delta(nodes, record["ops"])
+            header = record.get("header") or apply_header_delta(header, record.get("fields", {}))
+        return assemble(header, nodes)
+
+    def changes(self, law_id: str, timestamp: int) -> Dict[str, List]:
+        """Nœuds ajoutés ou modifiés par une version (tous pour la première)
+        et champs d'en-tête touchés : de quoi réindexer un amendement sans
+        relire toute la loi."""
+        for version, record in zip(self.versions(law_id), self.records(law_id)):
+            if version["timestamp"] == timestamp:
+                if "nodes" in record:
+                    return {"nodes": record["nodes"], "fields": list(record["header"])}
+                added = [node for op in record["ops"] if op[0] == "add" for node in op[1]]
+                return {"nodes": added, "fields": list(record.get("header") or record.get("fields", {}))}
+        return {"nodes": [], "fields": []}
+
+def update_versions(store: Optional[VersionStore] = None) -> Dict[str, int]:
+    stats = (store or VersionStore()).update()
+    print(f"Versions : {VERSIONS_DIR.relative_to(BASE_DIR)} | {stats['laws']} lois | {stats['versions']} versions | "
+          f"{stats['appended']} ajoutées ({stats['bytes'] / 1024:.0f} Ko écrits pour {stats['full_bytes'] / 1024:.0f} Ko "
+          f"de lois) | {stats['rewritten']} réécrites")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stock versionné des lois (deltas entre amendements).")
+    parser.add_argument("--get", metavar="LOI", help="afficher une loi (identifiant sans horodatage)")
+    parser.add_argument("--at", type=int, metavar="HORODATAGE", help="version à afficher avec --get")
+    parser.add_argument("--list", action="store_true", help="lister les lois ayant plusieurs versions")
+    args = parser.parse_args()
+    store = VersionStore()
+    if args.get:
+        law = store.load(args.get, args.at)
+        if law is None:
+            sys.exit(f"Version introuvable : {args.get}")
+        print(json.dumps(law, ensure_ascii=False, indent=2))
+    elif args.list:
+        for law_id in store.laws():
+            versions = store.versions(law_id)
+            if len(versions) > 1:
+                print(f"{law_id} | " + ", ".join(str(v["timestamp"]) for v in versions))
+    else:
+        update_versions(store)
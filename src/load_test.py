@@ -0,0 +1,118 @@
+# src/load_test.py
+import json
+import time
+import random
+import asyncio
+import argparse
+from urllib.parse import urlencode
+from typing import List, Dict, Any, Iterator
+
+from article_server import HOST, PORT
+
+# === CONFIGURATION ===
+CONNECTIONS = 64
+DURATION = 10.0
+# Part de chaque type de requête dans le mélange
+MIX = {"article": 0.6, "subtree": 0.2, "search": 0.2}
+SEED = 0
+
+# === 1. CLIENT HTTP MINIMAL (KEEP-ALIVE) ===
+class Connection:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, target: str) -> tuple:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {target} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode("utf-8"))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split(b" ", 2)[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+# === 2. MÉLANGE DE REQUÊTES TIRÉ DU CORPUS SERVI ===
+def request_mix(laws: List[Dict[str, Any]], rng: random.Random) -> Iterator[tuple]:
+    """Suite sans fin de requêtes (type, cible) : la durée borne le test."""
+    with_articles = [law for law in laws if law["articles"]]
+    words = [word for law in laws for word in law["title"].split() if len(word) > 3]
+    while True:
+        kind = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        law = rng.choice(with_articles)
+        if kind == "article":
+            query = {"law": law["key"], "number": rng.choice(law["articles"])}
+        elif kind == "subtree":
+            query = {"law": law["key"], "path": "0"}
+        else:
+            query = {"q": " ".join(rng.sample(words, 2)), "k": 10}
+        yield kind, f"/{kind}?{urlencode(query)}"
+
+async def worker(host: str, port: int, requests: Iterator[tuple], deadline: float, results: Dict[str, list]):
+    connection = Connection(host, port)
+    try:
+        for kind, target in requests:
+            if time.monotonic() >= deadline:
+                break
+            start = time.monotonic()
+            try:
+                status, _ = await connection.get(target)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection.close()
+                status = 0
+            results[kind].append((time.monotonic() - start, status == 200))
+    finally:
+        connection.close()
+
+def percentile(latencies: List[float], q: float) -> float:
+    return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3 if latencies else 0.0
+
+async def run(host: str = HOST, port: int = PORT, connections: int = CONNECTIONS, duration: float = DURATION,
+              seed: int = SEED):
+    probe = Connection(host, port)
+    status, body = await probe.get("/laws")
+    probe.close()
+    if status != 200:
+        raise SystemExit(f"Service injoignable ou vide : http://{host}:{port}/laws → {status}")
+    laws = json.loads(body)["laws"]
+    rng = random.Random(seed)
+    results: Dict[str, list] = {kind: [] for kind in MIX}
+    start = time.monotonic()
+    deadline = start + duration
+    await asyncio.gather(*(worker(host, port, request_mix(laws, random.Random(rng.random())), deadline, results)
+                           for _ in range(connections)))
+    elapsed = time.monotonic() - start
+
+    total = sum(len(samples) for samples in results.values())
+    print(f"{connections} connexions | {elapsed:.1f} s | {total} requêtes | {total / elapsed:.0f} req/s (client)")
+    for kind, samples in results.items():
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        print(f"   {kind:8} {len(samples):7} req | p50 {percentile(latencies, 0.5):7.2f} ms | "
+              f"p99 {percentile(latencies, 0.99):7.2f} ms | {errors} erreurs")
+    probe = Connection(host, port)
+    status, body = await probe.get("/metrics")
+    probe.close()
+    print("Côté serveur : " + json.dumps(json.loads(body)["routes"], ensure_ascii=False))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge du service des articles (article_server.py).")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("-c", "--connections", type=int, default=CONNECTIONS, help="connexions simultanées")
+    parser.add_argument("-d", "--duration", type=float, default=DURATION, help="durée en secondes")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.connections, args.duration, args.seed))
@@ -0,0 +1,93 @@
+# src/metrics.py
+import json
+import hashlib
+import time
+import cProfile
+import tracemalloc
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# === MESURES PAR FICHIER ===
+# Un enregistrement JSON par fichier traité : durée de chaque étape, octets
+# lus/écrits, sections par niveau, corrections OCR et erreur éventuelle.
+# Construit dans le processus qui traite le fichier, puis renvoyé au
+# processus principal qui l'écrit (un dict simple passe par le pool).
+
+class FileMetrics:
+    def __init__(self, source: str, profile_dir: Optional[Path] = None, trace_memory: bool = False):
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.record: Dict[str, Any] = {
+            "event": "file", "source": source, "status": "ok", "error": None,
+            "stages": {}, "bytes_in": 0, "bytes_out": 0,
+            "sections": {}, "ocr_fixes": 0, "double_fixes": 0, "dictionary_fixes": 0,
+        }
+        if trace_memory:
+            self.record["peak_bytes"] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Chronomètre une étape ; en option, profil cProfile (un fichier .prof
+        par fichier et par étape) et pic mémoire tracemalloc."""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile() if self.profile_dir else None
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            stages = self.record["stages"]
+            stages[name] = round(stages.get(name, 0.0) + time.perf_counter() - start, 6)
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - before
+                self.record["peak_bytes"][name] = max(self.record["peak_bytes"].get(name, 0), peak)
+            if profiler:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                profile = f"{profile_name(self.record['source'])}.{name}.prof"
+                profiler.dump_stats(self.profile_dir / profile)
+                self.record.setdefault("profiles", {})[name] = profile
+
+    def add(self, key: str, value: int):
+        self.record[key] += value
+
+    def fail(self, status: str, error: Optional[str] = None):
+        self.record["status"] = status
+        self.record["error"] = error
+
+def profile_name(source: str) -> str:
+    # Les chemins du corpus dépassent souvent 255 octets une fois aplatis :
+    # le fichier .prof est nommé par empreinte, retrouvable via "profiles".
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+# === JOURNAL JSON-LINES ===
+class MetricsWriter:
+    """Ajoute un enregistrement par ligne ; sans chemin, n'écrit rien."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._file = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]):
+        if self._file is not None:
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
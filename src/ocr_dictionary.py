@@ -0,0 +1,118 @@
+# src/ocr_dictionary.py
+import re
+import sys
+import json
+import itertools
+from pathlib import Path
+from collections import Counter
+from typing import Dict, Iterable
+
+from batch_clean_and_convert import (
+    BASE_DIR, INPUT_ROOT, CORRECTIONS_PATH, LETTER_RUN_RE, strip_layout, fix_ocr_al, collapse_whitespace,
+)
+
+# === CONFIGURATION ===
+DICTIONARY_VERSION = 1
+ARABIC_WORD_RE = re.compile(r'[ء-ي]+')
+
+# La ligature lam-alif (لا, لأ, لإ, لآ) est extraite à l'envers par l'OCR :
+# "خلال" devient "خالل", "العمالات" devient "العماالت".
+LIGATURES = {'ال': 'لا', 'أل': 'لأ', 'إل': 'لإ', 'آل': 'لآ'}
+REVERSED_LIGATURE_RE = re.compile('|'.join(LIGATURES))
+# Un alif suivi d'un alif n'existe pas en arabe : la ligature qui suit est
+# forcément inversée ("االبتدائية" → "الابتدائية").
+AFTER_ALIF_RE = re.compile('ا(' + '|'.join(LIGATURES) + ')')
+# Préfixes derrière lesquels "ال" est l'article et non une ligature
+ARTICLE_PREFIXES = {'', 'و', 'ف', 'ب', 'ك', 'وب', 'فب', 'وك', 'فك'}
+# Ailleurs, l'inversion n'est retenue que si la forme corrigée apparaît dans
+# le corpus et que le mot est assez long pour ne pas être un mot valide
+# ("مال", "صالح").
+MIN_ATTESTED_LENGTH = 5
+
+# Lettre étirée par l'OCR ("المممادة", "بتعييين") : chaque répétition est
+# ramenée à une ou deux lettres et seule la forme attestée la plus fréquente
+# est retenue ; sans forme attestée ("المممقضممممممممماة"), le mot est laissé.
+# Le tatweel, décoratif, n'est jamais replié.
+MAX_RUN_CANDIDATES = 16
+
+# Mots fautifs trop courts ou trop déformés pour être appris
+SEED_CORRECTIONS = {
+    'هللا': 'الله',
+    'خالل': 'خلال',
+    'إال': 'إلا',
+    'أال': 'ألا',
+}
+
+# === 1. APPRENTISSAGE ===
+def corpus_vocabulary(texts: Iterable[str]) -> Counter:
+    """Fréquence des mots après les corrections déjà appliquées au nettoyage
+    (marqueurs de page, "ا ل"), sans le dictionnaire lui-même."""
+    vocabulary = Counter()
+    for raw in texts:
+        clean, _ = fix_ocr_al(strip_layout(raw))
+        vocabulary.update(ARABIC_WORD_RE.findall(collapse_whitespace(clean)))
+    return vocabulary
+
+def correct_word(word: str, vocabulary: Counter) -> str:
+    corrected = AFTER_ALIF_RE.sub(lambda m: 'ا' + LIGATURES[m.group(1)], word)
+    if len(corrected) < MIN_ATTESTED_LENGTH:
+        return corrected
+    for match in REVERSED_LIGATURE_RE.finditer(corrected):
+        i = match.start()
+        if corrected[:i] in ARTICLE_PREFIXES:
+            continue
+        candidate = corrected[:i] + LIGATURES[match.group(0)] + corrected[i + 2:]
+        if vocabulary.get(candidate):
+            return candidate
+    return corrected
+
+def collapse_runs(word: str, vocabulary: Counter) -> str:
+    runs = [run for run in LETTER_RUN_RE.finditer(word) if run.group(1) != 'ـ']
+    if not runs or 2 ** len(runs) > MAX_RUN_CANDIDATES:
+        return word
+    best, best_count = word, 0
+    for lengths in itertools.product((1, 2), repeat=len(runs)):
+        parts, last = [], 0
+        for run, length in zip(runs, lengths):
+            parts += [word[last:run.start()], run.group(1) * length]
+            last = run.end()
+        candidate = "".join(parts) + word[last:]
+        if vocabulary.get(candidate, 0) > best_count:
+            best, best_count = candidate, vocabulary[candidate]
+    return best
+
+def learn_corrections(vocabulary: Counter) -> Dict[str, str]:
+    corrections = {}
+    for word in vocabulary:
+        corrected = SEED_CORRECTIONS.get(word) or correct_word(collapse_runs(word, vocabulary), vocabulary)
+        if corrected != word:
+            corrections[word] = corrected
+    return corrections
+
+# === 2. PERSISTANCE ===
+def save_corrections(corrections: Dict[str, str], vocabulary: Counter, path: Path = CORRECTIONS_PATH):
+    words = sorted(corrections, key=lambda w: (-vocabulary[w], w))
+    data = {
+        "version": DICTIONARY_VERSION,
+        "corrections": {w: corrections[w] for w in words},
+        "counts": {w: vocabulary[w] for w in words},
+    }
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+def build_dictionary(input_root: Path = INPUT_ROOT, path: Path = CORRECTIONS_PATH) -> Dict[str, str]:
+    texts = (p.read_text(encoding="utf-8", errors="ignore") for p in sorted(input_root.rglob("*.txt")))
+    vocabulary = corpus_vocabulary(texts)
+    corrections = learn_corrections(vocabulary)
+    save_corrections(corrections, vocabulary, path)
+    occurrences = sum(vocabulary[w] for w in corrections)
+    print(f"Dictionnaire OCR : {path.relative_to(BASE_DIR)} | {len(vocabulary)} mots distincts | "
+          f"{len(corrections)} corrections | {occurrences} occurrences")
+    return corrections
+
+if __name__ == "__main__":
+    corrections = build_dictionary()
+    for word, corrected in list(corrections.items())[:int(sys.argv[1]) if len(sys.argv) > 1 else 0]:
+        print(f"   {word} → {corrected}")
+    print("Relancer batch_clean_and_convert.py : les fichiers concernés seront reconstruits.")
@@ -0,0 +1,183 @@
+# src/query_cache.py
+import sys
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Hashable, Optional, Sequence
+
+from batch_clean_and_convert import MANIFEST_PATH
+from search import SEARCH_META, SEARCH_POSTINGS, SearchIndex, tokenize
+from corpus_index import INDEX_DB, connect, get_articles
+
+# === CONFIGURATION ===
+MAX_ENTRIES = 2048
+MAX_BYTES = 64 * 1024 * 1024
+TTL_SECONDS = 3600.0
+
+# === 1. VERSION DU CORPUS ===
+WATCHED_FILES = (MANIFEST_PATH, SEARCH_META, SEARCH_POSTINGS, INDEX_DB)
+
+# Empreinte du contenu de chaque fichier, recalculée seulement quand son
+# (mtime, taille) change : save_manifest réécrit le manifeste à chaque build,
+# même quand rien n'a changé, et cela ne doit pas vider le cache.
+_digests: Dict[Path, tuple] = {}
+
+def file_digest(path: Path) -> Optional[str]:
+    try:
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = _digests.get(path)
+        if cached is None or cached[0] != key:
+            cached = _digests[path] = (key, hashlib.sha1(path.read_bytes()).hexdigest())
+    except FileNotFoundError:
+        return None
+    return cached[1]
+
+def corpus_version(paths: Sequence[Path] = WATCHED_FILES) -> tuple:
+    """Empreinte du contenu du manifeste et des index (un stat par fichier,
+    relecture seulement s'il a été réécrit) : elle change quand un build ou
+    une reconstruction d'index produit un contenu différent."""
+    return tuple(file_digest(path) for path in paths)
+
+def normalize_query(query: str) -> str:
+    # Même normalisation que l'index : "الإضراب" et "الاضراب" partagent l'entrée
+    return " ".join(tokenize(query))
+
+# === 2. CACHE LRU / TTL BORNÉ EN ENTRÉES ET EN OCTETS ===
+class QueryCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, ttl: float = TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clé → (valeur, taille, expiration)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[2] <= self.clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        if size is None:
+            size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, self.clock() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0, "evictions": self.evictions,
+                "expirations": self.expirations, "invalidations": self.invalidations}
+
+# === 3. RECHERCHE ET CONSULTATION AVEC CACHE ===
+class CachedLookup:
+    """Recherche BM25 et consultation d'articles derrière un même cache. Le
+    cache est vidé, et les index rouverts, dès que la version du corpus
+    change."""
+
+    def __init__(self, cache: Optional[QueryCache] = None, version: Callable[[], tuple] = corpus_version):
+        self.cache = cache or QueryCache()
+        self._version_fn = version
+        self._version = None
+        self._search_index = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        version = self._version_fn()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        self.cache.clear()
+                    if self._conn is not None:
+                        self._conn.close()
+                    self._search_index = None
+                    self._conn = None
+                    self._version = version
+
+    # Chargement sous le verrou de _check_version, qui peut remettre les
+    # attributs à None depuis un autre thread : on rend la variable locale
+    @property
+    def search_index(self) -> SearchIndex:
+        with self._lock:
+            search_index = self._search_index
+            if search_index is None:
+                search_index = self._search_index = SearchIndex.load()
+        return search_index
+
+    @property
+    def conn(self):
+        with self._lock:
+            conn = self._conn
+            if conn is None:
+                conn = self._conn = connect()
+        return conn
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        self._check_version()
+        return self.cache.get_or_compute(("search", normalize_query(query), k),
+                                         lambda: self.search_index.search(query, k))
+
+    def articles(self, law: str, number: int) -> List[Dict[str, Any]]:
+        self._check_version()
+        return self.cache.get_or_compute(("articles", law.strip(), int(number)),
+                                         lambda: [dict(row) for row in get_articles(self.conn, law.strip(), int(number))])
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+if __name__ == "__main__":
+    # python src/query_cache.py "<requête>" ... : chaque requête passe par le cache
+    lookup = CachedLookup()
+    for query in sys.argv[1:] * 2:
+        start = time.perf_counter()
+        hits = lookup.search(query)
+        print(f"{(time.perf_counter() - start) * 1e3:8.3f} ms | {len(hits)} résultats | {query}")
+    print(lookup.stats())
@@ -0,0 +1,177 @@
+# src/search.py
+import re
+import sys
+import json
+import math
+import time
+import heapq
+import hashlib
+from array import array
+from pathlib import Path
+from collections import Counter
+from typing import List, Dict, Any, Iterable
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT, OCR_AL_RE, iter_json_laws
+
+# === CONFIGURATION ===
+SEARCH_DIR = BASE_DIR / "corpus"
+SEARCH_META = SEARCH_DIR / "search.json"
+SEARCH_POSTINGS = SEARCH_DIR / "search.bin"
+SEARCH_VERSION = 2
+OPEN_RETRIES = 20
+OPEN_RETRY_DELAY = 0.05
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# === 1. NORMALISATION ARABE ===
+ARABIC_TABLE = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ـ': None,  # tatweel
+    **{chr(c): None for c in range(0x064B, 0x0653)},  # voyelles brèves, shadda, soukoun
+})
+TOKEN_RE = re.compile(r'\w+')
+
+def normalize_arabic(text: str) -> str:
+    text = OCR_AL_RE.sub(r'ال\1', text)  # "ا لمادة" → "المادة", comme au nettoyage
+    return text.translate(ARABIC_TABLE).lower()
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(normalize_arabic(text)):
+        if token.startswith('ال') and len(token) > 3:
+            token = token[2:]
+        tokens.append(token)
+    return tokens
+
+# === 2. DOCUMENTS ===
+def iter_documents(json_root: Path = JSON_ROOT) -> Iterable[tuple]:
+    """(métadonnées, texte) pour chaque nœud ayant un contenu."""
+    for key, law in iter_json_laws(json_root):
+        yield from law_documents(key, law)
+
+def law_documents(key: str, law: Dict[str, Any]) -> Iterable[tuple]:
+    stack = [(law["structure"], "")]
+    while stack:
+        nodes, prefix = stack.pop()
+        for i, node in enumerate(nodes):
+            path = f"{prefix}{i}"
+            if node["content"]:
+                meta = {"law": key, "law_title": law["title"], "path": path,
+                        "type": node["type"], "title": node["title"], "number": node["number"]}
+                yield meta, f"{node['title']} {node['content']}"
+            if node["children"]:
+                stack.append((node["children"], path + "/"))
+
+# === 3. INDEX INVERSÉ BM25 ===
+class SearchIndex:
+    """Index inversé : pour chaque terme, une tranche contiguë de deux
+    tableaux `array('I')` (identifiants de documents, fréquences)."""
+
+    def __init__(self, docs, doc_lengths, terms, doc_ids, freqs):
+        self.docs = docs
+        self.doc_lengths = doc_lengths
+        self.terms = terms  # terme → (début, nombre de documents)
+        self.doc_ids = doc_ids
+        self.freqs = freqs
+        self.avgdl = (sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0) or 1.0
+
+    @classmethod
+    def build(cls, documents: Iterable[tuple]) -> "SearchIndex":
+        docs = []
+        doc_lengths = array('I')
+        postings: Dict[str, List[int]] = {}
+        for doc_id, (meta, text) in enumerate(documents):
+            tokens = tokenize(text)
+            docs.append(meta)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).extend((doc_id, tf))
+
+        terms = {}
+        doc_ids = array('I')
+        freqs = array('I')
+        for term in sorted(postings):
+            flat = postings[term]
+            terms[term] = (len(doc_ids), len(flat) // 2)
+            doc_ids.extend(flat[0::2])
+            freqs.extend(flat[1::2])
+        return cls(docs, doc_lengths, terms, doc_ids, freqs)
+
+    def save(self, meta_path: Path = SEARCH_META, postings_path: Path = SEARCH_POSTINGS):
+        """Les postings finissent par l'empreinte de l'index, reprise dans
+        `generation` de la méta : load() vérifie que les deux fichiers
+        viennent du même enregistrement (comme le trailer de corpus_store)."""
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {"version": SEARCH_VERSION, "itemsize": self.doc_ids.itemsize, "postings": len(self.doc_ids),
+                "docs": self.docs, "doc_lengths": self.doc_lengths.tolist(), "terms": self.terms}
+        digest = hashlib.sha1(json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        digest.update(self.doc_ids.tobytes())
+        digest.update(self.freqs.tobytes())
+        meta["generation"] = digest.hexdigest()
+        tmp_bin = postings_path.with_name(postings_path.name + ".tmp")
+        with open(tmp_bin, "wb") as f:
+            self.doc_ids.tofile(f)
+            self.freqs.tofile(f)
+            f.write(meta["generation"].encode("ascii"))
+        tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+        tmp_meta.write_text(json.dumps(meta, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp_bin.replace(postings_path)
+        tmp_meta.replace(meta_path)
+
+    @classmethod
+    def load(cls, meta_path: Path = SEARCH_META, postings_path: Path = SEARCH_POSTINGS) -> "SearchIndex":
+        if not meta_path.exists() or not postings_path.exists():
+            raise FileNotFoundError(f"Index de recherche introuvable : {meta_path} (lancer search.py --build)")
+        for _ in range(OPEN_RETRIES):
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("version") != SEARCH_VERSION or meta.get("itemsize") != array('I').itemsize:
+                raise ValueError(f"Index de recherche incompatible : {meta_path}")
+            doc_ids, freqs = array('I'), array('I')
+            with open(postings_path, "rb") as f:
+                try:
+                    doc_ids.fromfile(f, meta["postings"])
+                    freqs.fromfile(f, meta["postings"])
+                    generation = f.read().decode("ascii")
+                except (EOFError, UnicodeDecodeError):
+                    generation = None
+            if generation == meta.get("generation"):
+                terms = {term: tuple(span) for term, span in meta["terms"].items()}
+                return cls(meta["docs"], array('I', meta["doc_lengths"]), terms, doc_ids, freqs)
+            # Enregistrement en cours entre les deux remplacements : on relit le tout
+            time.sleep(OPEN_RETRY_DELAY)
+        raise ValueError(f"Postings et méta de générations différentes : {meta_path} (relancer search.py --build)")
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        n_docs = len(self.docs)
+        if not n_docs:
+            return []
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            span = self.terms.get(term)
+            if span is None:
+                continue
+            start, df = span
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in zip(self.doc_ids[start:start + df], self.freqs[start:start + df]):
+                denom = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / self.avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / denom
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [dict(self.docs[doc_id], score=round(score, 4)) for doc_id, score in best]
+
+def build_search_index(json_root: Path = JSON_ROOT) -> SearchIndex:
+    index = SearchIndex.build(iter_documents(json_root))
+    index.save()
+    print(f"Index BM25 : {SEARCH_META.relative_to(BASE_DIR)} | {len(index.docs)} documents | "
+          f"{len(index.terms)} termes | {len(index.doc_ids)} entrées")
+    return index
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--build":
+        build_search_index()
+    elif len(sys.argv) > 1:
+        index = SearchIndex.load()
+        for hit in index.search(" ".join(sys.argv[1:])):
+            print(f"{hit['score']:8.3f} | {hit['law_title']} › {hit['title'][:80]}")
+    else:
+        print("Usage : python src/search.py --build | python src/search.py <requête>")
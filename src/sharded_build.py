@@ -0,0 +1,253 @@
+# src/sharded_build.py
+import sys
+import json
+import shutil
+import filecmp
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Iterable
+
+from batch_clean_and_convert import (
+    BASE_DIR, INPUT_ROOT, CLEAN_ROOT, JSON_ROOT, MANIFEST_PATH, CORRECTIONS_PATH, PIPELINE_VERSION,
+    shard_of, shard_manifest_path, file_hash, manifest_entry, output_paths, law_key, save_manifest,
+    manifest_files, prune_orphans, keep_orphans, write_law_reference, content_reference,
+)
+
+# Build réparti en trois temps :
+#   1. plan    : répartition des fichiers de text/ en N shards (hachage stable du chemin) ;
+#   2. shard   : sur chaque machine, `batch_clean_and_convert.py --shard I/N`
+#                écrit les sorties du shard et shards/manifest-III-of-NNN.json ;
+#   3. merge   : rassemble les sorties des shards, refait le dédoublonnage sur
+#                tout le corpus, écrit manifest.json puis les index dérivés.
+
+# === CONFIGURATION ===
+# Différences affichées au plus par la vérification
+MAX_REPORTED = 20
+
+def input_files() -> List[Path]:
+    return sorted(f for f in INPUT_ROOT.rglob("*.txt") if f.is_file())
+
+def input_key(txt_file: Path) -> str:
+    return txt_file.relative_to(INPUT_ROOT).as_posix()
+
+# === 1. RÉPARTITION ===
+def plan(shards: int) -> List[Dict[str, int]]:
+    sizes = [{"files": 0, "bytes": 0} for _ in range(shards)]
+    for txt_file in input_files():
+        size = sizes[shard_of(input_key(txt_file), shards)]
+        size["files"] += 1
+        size["bytes"] += txt_file.stat().st_size
+    return sizes
+
+# === 2. FUSION ===
+def load_shard_manifests(shards: int, roots: Iterable[Path]) -> Dict[int, tuple]:
+    """shard → (racine où il a été construit, manifeste). Chaque racine est la
+    copie du dépôt d'une machine (json/, cleaned_txt/, shards/) ; un même
+    dépôt partagé peut contenir plusieurs shards."""
+    found: Dict[int, tuple] = {}
+    for root in roots:
+        for index in range(shards):
+            path = root / shard_manifest_path(index, shards).relative_to(BASE_DIR)
+            if not path.exists():
+                continue
+            if index in found:
+                raise ValueError(f"shard {index} présent dans {found[index][0]} et dans {root}")
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+            if manifest.get("version") != PIPELINE_VERSION or manifest.get("shard") != [index, shards]:
+                raise ValueError(f"{path} : construit par une autre version du pipeline ou pour un autre découpage")
+            found[index] = (root, manifest)
+    missing = [str(i) for i in range(shards) if i not in found]
+    if missing:
+        raise ValueError(f"manifestes de shard absents : {', '.join(missing)} sur {shards}")
+    return found
+
+def copy_output(root: Path, rel: str) -> bool:
+    """Copie atomique d'une sortie de shard ; rien à faire si le shard a été
+    construit dans ce dépôt ou si la sortie est déjà identique."""
+    source, target = root / rel, BASE_DIR / rel
+    if source.resolve() == target.resolve():
+        return False
+    if target.exists() and filecmp.cmp(source, target, shallow=False):
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.copyfile(source, tmp)
+    tmp.replace(target)
+    return True
+
+def merge_shards(shards: int, roots: Iterable[Path] = (BASE_DIR,), prune: bool = False) -> Dict[str, int]:
+    """Le dédoublonnage par contenu est refait sur tout le corpus : deux
+    copies d'une loi tombées dans des shards différents ont chacune été
+    converties ; seule la copie canonique d'un build unique (premier chemin
+    trié) est reprise, les autres deviennent des renvois. Les fichiers
+    absents, en échec ou périmés dans leur shard bloquent la fusion. `prune`
+    : comme process_all_files, seules les sorties des entrées du manifeste
+    précédent dont le .txt a disparu sont supprimées."""
+    found = load_shard_manifests(shards, roots)
+    txt_files = input_files()
+    problems = []
+    sources = []
+    for txt_file in txt_files:
+        key = input_key(txt_file)
+        index = shard_of(key, shards)
+        entry = found[index][1]["files"].get(key)
+        digest = file_hash(txt_file)
+        if entry is None:
+            problems.append(f"{key} : absent du shard {index} (échec ou shard incomplet)")
+        elif entry["hash"] != digest:
+            problems.append(f"{key} : modifié depuis la construction du shard {index}")
+        else:
+            sources.append((txt_file, digest, index, entry))
+    write_clean = {entry["clean"] is not None for _, _, _, entry in sources if "ref" not in entry}
+    if len(write_clean) > 1:
+        problems.append("shards construits avec et sans --no-clean-txt")
+    write_clean = write_clean.pop() if write_clean else True
+
+    manifest = {"version": PIPELINE_VERSION, "files": {}}
+    canonical_by_hash: Dict[str, Path] = {}
+    expected = set()
+    references = []
+    for txt_file, digest, index, entry in sources:
+        canonical = canonical_by_hash.setdefault(digest, txt_file)
+        ref = law_key(output_paths(canonical)[1]) if canonical != txt_file else None
+        merged = manifest_entry(txt_file, digest, write_clean, ref)
+        if ref is None and "ref_digest" in entry:
+            # Renvoi vers une loi fournie en .json : la même dans tous les shards
+            merged = content_reference(merged, entry["ref"], entry["ref_digest"])
+        if entry.get("rules") != merged.get("rules"):
+            problems.append(f"{input_key(txt_file)} : shard {index} construit avec un autre dictionnaire OCR")
+        # La copie canonique est aussi la première de son shard : jamais un renvoi
+        elif ref is not None:
+            references.append((txt_file, canonical, index, entry))
+        manifest["files"][input_key(txt_file)] = merged
+        expected.update(BASE_DIR / merged[k] for k in ("clean", "json") if merged[k])
+    if problems:
+        raise ValueError("\n".join(problems))
+
+    copied = 0
+    for txt_file, _, index, entry in sources:
+        merged = manifest["files"][input_key(txt_file)]
+        if "ref" not in merged or "ref_digest" in merged:
+            copied += sum(copy_output(found[index][0], merged[k]) for k in ("clean", "json") if merged[k])
+    for txt_file, canonical, index, entry in references:
+        clean_file, json_file = output_paths(txt_file)
+        write_law_reference(clean_file, json_file, output_paths(canonical)[1])
+        # Canonique dans son shard, renvoi dans le corpus : le fichier nettoyé
+        # que ce shard a écrit dans ce dépôt n'a plus lieu d'être
+        if entry.get("clean") and found[index][0].resolve() == BASE_DIR.resolve():
+            clean_file.unlink(missing_ok=True)
+    previous = manifest_files(MANIFEST_PATH)
+    if prune:
+        removed = prune_orphans(previous, expected, log=lambda *_: None)
+    else:
+        removed = 0
+        keep_orphans(previous, manifest["files"])
+    save_manifest(manifest)
+    stats = {"files": len(txt_files), "copied": copied, "referenced": len(references), "removed": removed}
+    print(f"Fusion de {shards} shards : {stats['files']} fichiers | {copied} sorties copiées | "
+          f"{len(references)} copies référencées | {removed} orphelins supprimés")
+    return stats
+
+# === 3. VÉRIFICATION CONTRE UN BUILD UNIQUE ===
+def tree_differences(reference: Path, merged: Path) -> List[str]:
+    differences = []
+    for sub in (JSON_ROOT.name, CLEAN_ROOT.name):
+        left = {f.relative_to(reference): f for f in (reference / sub).rglob("*") if f.is_file()}
+        right = {f.relative_to(merged): f for f in (merged / sub).rglob("*") if f.is_file()}
+        for rel in sorted(left.keys() | right.keys()):
+            if rel not in right:
+                differences.append(f"absent de la fusion : {rel}")
+            elif rel not in left:
+                differences.append(f"en trop dans la fusion : {rel}")
+            elif not filecmp.cmp(left[rel], right[rel], shallow=False):
+                differences.append(f"contenu différent : {rel}")
+    return differences
+
+def verify(workers: int = 0, refs: bool = False) -> List[str]:
+    """Reconstruit tout le corpus sur cette machine dans un dossier temporaire
+    (mêmes sources, mêmes entrées, même dictionnaire OCR) et le compare octet
+    par octet à la fusion : sorties, manifeste et, si demandé, graphe des renvois."""
+    merged = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    write_clean = any(entry["clean"] for entry in merged["files"].values())
+    with tempfile.TemporaryDirectory(prefix="build-unique-") as tmp:
+        reference = Path(tmp)
+        shutil.copytree(BASE_DIR / "src", reference / "src", ignore=shutil.ignore_patterns("__pycache__"))
+        (reference / INPUT_ROOT.name).symlink_to(INPUT_ROOT.resolve(), target_is_directory=True)
+        if CORRECTIONS_PATH.exists():
+            shutil.copyfile(CORRECTIONS_PATH, reference / CORRECTIONS_PATH.name)
+        # Les sorties que le pipeline ne produit pas (lois venues d'une source
+        # .json) font partie du corpus des deux côtés
+        owned = {entry[k] for entry in merged["files"].values() for k in ("clean", "json") if entry[k]}
+        for root in (JSON_ROOT, CLEAN_ROOT):
+            for f in root.rglob("*"):
+                rel = f.relative_to(BASE_DIR)
+                if f.is_file() and rel.as_posix() not in owned:
+                    (reference / rel).parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(f, reference / rel)
+        command = [sys.executable, str(reference / "src" / "batch_clean_and_convert.py"),
+                   "--force", "--quiet", "--workers", str(workers)]
+        if not write_clean:
+            command.append("--no-clean-txt")
+        if refs:
+            command.append("--refs")
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+        differences = tree_differences(reference, BASE_DIR)
+        single = json.loads((reference / MANIFEST_PATH.name).read_text(encoding="utf-8"))
+        # Les entrées gardées pour une suppression ultérieure (.txt disparu)
+        # n'existent pas dans un build neuf
+        merged["files"] = {k: v for k, v in merged["files"].items() if (INPUT_ROOT / k).is_file()}
+        if single != merged:
+            differences.append(f"manifeste différent : {MANIFEST_PATH.name}")
+        if refs:
+            from cross_refs import REFS_PATH
+            rel = REFS_PATH.relative_to(BASE_DIR)
+            if not filecmp.cmp(reference / rel, REFS_PATH, shallow=False):
+                differences.append(f"contenu différent : {rel}")
+    return differences
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build réparti du corpus : répartition, fusion et vérification.")
+    parser.add_argument("command", choices=("plan", "merge"))
+    parser.add_argument("-n", "--shards", type=int, required=True, help="nombre de shards")
+    parser.add_argument("--from", dest="roots", type=Path, action="append", metavar="DOSSIER",
+                        help="dépôt où un ou plusieurs shards ont été construits (répétable, défaut : ce dépôt)")
+    parser.add_argument("--prune", action="store_true",
+                        help="supprimer les sorties des fichiers .txt retirés depuis le build précédent")
+    parser.add_argument("--index", action="store_true", help="reconstruire l'index SQLite après la fusion")
+    parser.add_argument("--refs", action="store_true", help="reconstruire le graphe des renvois après la fusion")
+    parser.add_argument("--versions", action="store_true", help="ranger les nouvelles versions des lois après la fusion")
+    parser.add_argument("--verify", action="store_true",
+                        help="comparer la fusion à un build complet sur cette machine (lent)")
+    parser.add_argument("-j", "--workers", type=int, default=0, help="processus du build de vérification (0 = tous les cœurs)")
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards doit être ≥ 1")
+
+    if args.command == "plan":
+        for index, size in enumerate(plan(args.shards)):
+            print(f"shard {index}/{args.shards} : {size['files']} fichiers | {size['bytes'] / 1024 / 1024:.1f} Mo "
+                  f"| python src/batch_clean_and_convert.py --shard {index}/{args.shards}")
+        sys.exit(0)
+
+    try:
+        merge_shards(args.shards, args.roots or [BASE_DIR], prune=args.prune)
+    except ValueError as e:
+        sys.exit(f"Fusion impossible :\n{e}")
+    if args.index:
+        from corpus_index import build_index
+        build_index()
+    if args.refs:
+        from cross_refs import build_reference_graph
+        build_reference_graph()
+    if args.versions:
+        from law_versions import update_versions
+        update_versions()
+    if args.verify:
+        differences = verify(args.workers, args.refs)
+        for line in differences[:MAX_REPORTED]:
+            print(f"   ✗ {line}")
+        print(f"Vérification : {'identique au build unique' if not differences else f'{len(differences)} différences'}")
+        sys.exit(1 if differences else 0)
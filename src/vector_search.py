@@ -0,0 +1,243 @@
+# src/vector_search.py
+import sys
+import json
+import mmap
+import time
+import zlib
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from collections import Counter
+from typing import List, Dict, Any, Iterable
+
+import numpy as np
+
+from batch_clean_and_convert import BASE_DIR, JSON_ROOT
+from search import TOKEN_RE, normalize_arabic, iter_documents
+
+# === CONFIGURATION ===
+VECTOR_DIR = BASE_DIR / "corpus"
+VECTOR_META = VECTOR_DIR / "vectors.json"
+# Matrice creuse rangée par colonne (CSC) : pour chaque colonne, les
+# documents qui l'ont et leur poids. Une requête ne lit que les colonnes de
+# ses n-grammes ; les trois tableaux sont projetables en mémoire
+# (np.load(mmap_mode="r")) et partagés entre processus.
+VECTOR_POINTERS = VECTOR_DIR / "vectors.ptr.npy"
+VECTOR_ROWS = VECTOR_DIR / "vectors.rows.npy"
+VECTOR_VALUES = VECTOR_DIR / "vectors.values.npy"
+VECTOR_IDF = VECTOR_DIR / "vectors.idf.npy"
+VECTOR_VERSION = 3
+OPEN_RETRIES = 20
+OPEN_RETRY_DELAY = 0.05
+
+N_FEATURES = 2 ** 14
+NGRAM_RANGE = (3, 5)
+# n-grammes dont la colonne reste en cache (crc32 évité pour les plus fréquents)
+COLUMN_CACHE = 2 ** 16
+
+# === 1. VECTORISATION PAR HACHAGE ===
+@lru_cache(maxsize=COLUMN_CACHE)
+def ngram_column(ngram: str, n_features: int) -> int:
+    return zlib.crc32(ngram.encode("utf-8")) % n_features
+
+class HashingVectorizer:
+    """n-grammes de caractères de chaque mot normalisé (bordé d'espaces),
+    hachés (crc32, stable d'un processus à l'autre) vers `n_features`
+    colonnes ; poids tf sous-linéaire 1 + log(tf). Un texte devient une
+    ligne creuse : (colonnes triées, poids)."""
+
+    def __init__(self, n_features: int = N_FEATURES, ngram_range=NGRAM_RANGE):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+
+    def ngrams(self, text: str) -> Counter:
+        low, high = self.ngram_range
+        counts = Counter()
+        for word in TOKEN_RE.findall(normalize_arabic(text)):
+            word = f" {word} "
+            for n in range(low, min(high, len(word)) + 1):
+                counts.update(word[i:i + n] for i in range(len(word) - n + 1))
+        return counts
+
+    def transform_one(self, text: str) -> tuple:
+        counts = self.ngrams(text)
+        columns = np.fromiter((ngram_column(g, self.n_features) for g in counts), dtype=np.int64, count=len(counts))
+        weights = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        # Collisions de hachage : poids des n-grammes d'une même colonne additionnés
+        columns, slots = np.unique(columns, return_inverse=True)
+        return columns, np.bincount(slots, weights=weights, minlength=len(columns))
+
+def normalize_row(columns: np.ndarray, weights: np.ndarray) -> tuple:
+    norm = np.linalg.norm(weights)
+    return columns, (weights / norm if norm else weights)
+
+def gather(pointers: np.ndarray, columns: np.ndarray) -> tuple:
+    """Positions des entrées des colonnes demandées dans rows/values, et
+    nombre d'entrées par colonne (concaténation vectorisée des tranches)."""
+    starts = np.asarray(pointers[columns], dtype=np.int64)
+    lengths = np.asarray(pointers[columns + 1], dtype=np.int64) - starts
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return shift + np.arange(int(lengths.sum()), dtype=np.int64), lengths
+
+def map_array(path: Path) -> tuple:
+    """Projette un .npy en lecture seule et renvoie (tableau, génération) :
+    save() écrit l'empreinte de l'index après les données du tableau. Le
+    tableau et sa génération viennent de la même projection, donc du même
+    fichier même s'il est remplacé entre-temps."""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, dtype = read_header(f)
+        offset = f.tell()
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    count = int(np.prod(shape))
+    end = offset + count * dtype.itemsize
+    if end > len(data):
+        return None, None
+    array = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return array, data[end:].decode("ascii", "replace")
+
+# === 2. INDEX VECTORIEL ===
+class VectorIndex:
+    """Matrice TF-IDF creuse (documents × n_features) normalisée L2, rangée
+    par colonne. La similarité cosinus d'un lot de requêtes se calcule en un
+    appel : les entrées des colonnes des requêtes sont rassemblées, pondérées
+    et additionnées par (requête, document) avec np.bincount."""
+
+    def __init__(self, docs: List[Dict[str, Any]], pointers: np.ndarray, rows: np.ndarray, values: np.ndarray,
+                 idf: np.ndarray, vectorizer: HashingVectorizer):
+        self.docs = docs
+        self.pointers = pointers
+        self.rows = rows
+        self.values = values
+        self.idf = idf
+        self.vectorizer = vectorizer
+
+    @property
+    def nbytes(self) -> int:
+        return self.pointers.nbytes + self.rows.nbytes + self.values.nbytes
+
+    @classmethod
+    def build(cls, documents: Iterable[tuple], n_features: int = N_FEATURES, ngram_range=NGRAM_RANGE) -> "VectorIndex":
+        vectorizer = HashingVectorizer(n_features, ngram_range)
+        docs = []
+        doc_rows = []
+        for meta, text in documents:
+            docs.append(meta)
+            doc_rows.append(vectorizer.transform_one(text))
+        columns = np.concatenate([c for c, _ in doc_rows] or [np.zeros(0, dtype=np.int64)])
+        df = np.bincount(columns, minlength=n_features)
+        idf = (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+        weights = np.concatenate([normalize_row(c, w * idf[c])[1] for c, w in doc_rows] or [np.zeros(0)])
+        rows = np.repeat(np.arange(len(docs), dtype=np.int32), [len(c) for c, _ in doc_rows])
+        # Tri stable par colonne : dans une colonne, les documents restent dans l'ordre
+        order = np.argsort(columns, kind="stable")
+        pointers = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+        return cls(docs, pointers, rows[order], weights[order].astype(np.float32), idf, vectorizer)
+
+    def save(self, meta_path: Path = VECTOR_META):
+        """Chaque tableau finit par l'empreinte de l'index, reprise dans
+        `generation` de la méta : load() vérifie que les cinq fichiers
+        viennent du même enregistrement (comme le trailer de corpus_store)."""
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {"version": VECTOR_VERSION, "n_features": self.vectorizer.n_features,
+                "ngram_range": list(self.vectorizer.ngram_range), "docs": self.docs}
+        arrays = [(VECTOR_POINTERS, np.ascontiguousarray(self.pointers)), (VECTOR_ROWS, np.ascontiguousarray(self.rows)),
+                  (VECTOR_VALUES, np.ascontiguousarray(self.values)), (VECTOR_IDF, np.ascontiguousarray(self.idf))]
+        digest = hashlib.sha1(json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        for _, array in arrays:
+            digest.update(array.tobytes())
+        meta["generation"] = digest.hexdigest()
+        # Fichiers temporaires ouverts explicitement : np.save ajouterait .npy au nom
+        written = []
+        for path, array in arrays:
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+                f.write(meta["generation"].encode("ascii"))
+            written.append((tmp, path))
+        tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+        tmp_meta.write_text(json.dumps(meta, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        for tmp, path in written:
+            tmp.replace(path)
+        tmp_meta.replace(meta_path)
+
+    @classmethod
+    def load(cls, meta_path: Path = VECTOR_META) -> "VectorIndex":
+        paths = (VECTOR_POINTERS, VECTOR_ROWS, VECTOR_VALUES, VECTOR_IDF)
+        if not (meta_path.exists() and all(path.exists() for path in paths)):
+            raise FileNotFoundError(f"Index vectoriel introuvable : {meta_path} (lancer vector_search.py --build)")
+        for _ in range(OPEN_RETRIES):
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("version") != VECTOR_VERSION:
+                raise ValueError(f"Index vectoriel incompatible : {meta_path}")
+            # Projection en lecture seule : les pages sont partagées entre les workers
+            mapped = [map_array(path) for path in paths]
+            if all(generation == meta.get("generation") for _, generation in mapped):
+                break
+            # Enregistrement en cours entre les remplacements : on relit le tout
+            time.sleep(OPEN_RETRY_DELAY)
+        else:
+            raise ValueError(f"Tableaux et méta de générations différentes : {meta_path} "
+                             f"(relancer vector_search.py --build)")
+        pointers, rows, values, idf = (array for array, _ in mapped)
+        if len(pointers) != meta["n_features"] + 1 or len(rows) != len(values) or pointers[-1] != len(rows):
+            raise ValueError(f"Index vectoriel incohérent : {meta_path}")
+        vectorizer = HashingVectorizer(meta["n_features"], meta["ngram_range"])
+        return cls(meta["docs"], pointers, rows, values, idf, vectorizer)
+
+    def encode(self, query: str) -> tuple:
+        columns, weights = self.vectorizer.transform_one(query)
+        return normalize_row(columns, weights * self.idf[columns])
+
+    def scores(self, queries: List[str]) -> np.ndarray:
+        """Matrice documents × requêtes des similarités cosinus."""
+        n_docs = len(self.docs)
+        encoded = [self.encode(query) for query in queries]
+        columns = np.concatenate([c for c, _ in encoded])
+        positions, lengths = gather(self.pointers, columns)
+        weights = np.repeat(np.concatenate([w for _, w in encoded]), lengths)
+        query_of = np.repeat(np.repeat(np.arange(len(queries)), [len(c) for c, _ in encoded]), lengths)
+        cells = query_of * n_docs + self.rows[positions]
+        flat = np.bincount(cells, weights=weights * self.values[positions], minlength=len(queries) * n_docs)
+        return flat.reshape(len(queries), n_docs).T
+
+    def search_many(self, queries: List[str], k: int = 10) -> List[List[Dict[str, Any]]]:
+        """Toutes les requêtes en un appel, puis argpartition pour les k
+        meilleurs de chaque colonne."""
+        if k < 1:
+            raise ValueError(f"k doit être au moins 1 : {k}")
+        n_docs = len(self.docs)
+        if not queries:
+            return []
+        if not n_docs:
+            return [[] for _ in queries]
+        k = min(k, n_docs)
+        scores = self.scores(queries)
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for q in range(len(queries)):
+            column = scores[:, q]
+            best = top[:, q][np.argsort(-column[top[:, q]], kind="stable")]
+            results.append([dict(self.docs[i], score=round(float(column[i]), 4)) for i in best if column[i] > 0])
+        return results
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        return self.search_many([query], k)[0]
+
+def build_vector_index(json_root: Path = JSON_ROOT) -> VectorIndex:
+    index = VectorIndex.build(iter_documents(json_root))
+    index.save()
+    print(f"Index vectoriel : {VECTOR_META.relative_to(BASE_DIR)} | {len(index.docs)} documents | "
+          f"{index.vectorizer.n_features} dimensions | {len(index.rows)} entrées | {index.nbytes / 1e6:.1f} Mo")
+    return index
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--build":
+        build_vector_index()
+    elif len(sys.argv) > 1:
+        index = VectorIndex.load()
+        for hit in index.search(" ".join(sys.argv[1:])):
+            print(f"{hit['score']:6.3f} | {hit['law_title']} › {hit['title'][:80]}")
+    else:
+        print("Usage : python src/vector_search.py --build | python src/vector_search.py <requête>")
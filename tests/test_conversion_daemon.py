@@ -0,0 +1,37 @@
+# tests/test_conversion_daemon.py
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from conversion_daemon import HttpError, read_request
+
+def parse(raw: bytes):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_request(reader)
+    return asyncio.run(run())
+
+def test_body_read_with_content_length():
+    assert parse(b"POST /convert HTTP/1.1\r\nContent-Length: 4\r\n\r\nabcd") == (
+        "POST", "/convert", {"content-length": "4"}, b"abcd")
+
+@pytest.mark.parametrize("value", [b"abc", b"-1", b"1_0", b"+4", b"\xb2"])
+def test_invalid_content_length_is_rejected(value):
+    with pytest.raises(HttpError) as error:
+        parse(b"POST /convert HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\nabcd")
+    assert error.value.status == 400
+
+@pytest.mark.parametrize("raw, status", [
+    (b"GET /" + b"a" * 2 ** 17 + b" HTTP/1.1\r\n\r\n", 400),
+    (b"GET / HTTP/1.1\r\nX-Long: " + b"a" * 2 ** 17 + b"\r\n\r\n", 431),
+])
+def test_line_over_reader_limit_is_rejected(raw, status):
+    with pytest.raises(HttpError) as error:
+        parse(raw)
+    assert error.value.status == status
@@ -0,0 +1,52 @@
+# tests/test_dedup.py
+import sys
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO / "src"))
+
+from article_server import CorpusSnapshot
+from corpus_index import connect, find_law
+
+# Même loi fournie en .json dans "القوانين التنظيمية" et en .txt dans la
+# catégorie de l'institution (corpus réel)
+NAME = "ظـهير شريف رقم 1.16.107 بتنفيذ القالسلطات العمومية-1735203816126"
+PROVIDED = f"القوانين التنظيمية/{NAME}"
+COPY = f"القوانين المنظمة للمؤسسات والهيئات الدستورية/السلطة التشريعية/{NAME}"
+
+def make_tree(root: Path):
+    shutil.copytree(REPO / "src", root / "src", ignore=shutil.ignore_patterns("__pycache__"))
+    for rel in (f"text/{PROVIDED}.json", f"json/{PROVIDED}.json", f"text/{COPY}.txt"):
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(REPO / rel, root / rel)
+
+def run(root: Path, script: str, *args: str) -> str:
+    done = subprocess.run([sys.executable, str(root / "src" / script), *args], cwd=root,
+                          capture_output=True, text=True, check=True)
+    return done.stdout
+
+def test_converted_copy_of_provided_law_becomes_reference(tmp_path):
+    make_tree(tmp_path)
+    run(tmp_path, "batch_clean_and_convert.py")
+    stub = json.loads((tmp_path / f"json/{COPY}.json").read_text(encoding="utf-8"))
+    assert stub["ref"] == PROVIDED
+    assert not (tmp_path / f"cleaned_txt/{COPY}_clean.txt").exists()
+    entry = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))["files"][f"{COPY}.txt"]
+    assert entry["ref"] == PROVIDED and entry["clean"] is None
+
+    # Deuxième passage : le renvoi est reconnu sans reconversion
+    assert "Copies référencées : 0 | Inchangés : 1" in run(tmp_path, "batch_clean_and_convert.py")
+
+def test_readers_resolve_reference(tmp_path):
+    make_tree(tmp_path)
+    run(tmp_path, "batch_clean_and_convert.py", "--index")
+    conn = connect(tmp_path / "corpus" / "corpus.sqlite3")
+    assert find_law(conn, COPY)["key"] == PROVIDED
+
+    snapshot = CorpusSnapshot(tmp_path / "json")
+    assert len(snapshot.laws) == 1
+    assert snapshot.subtree(COPY, "") == snapshot.subtree(PROVIDED, "") is not None
+    assert snapshot.subtree(COPY, "0/0")["title"] == snapshot.subtree(PROVIDED, "0/0")["title"]
@@ -0,0 +1,31 @@
+# tests/test_normalize.py
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from batch_clean_and_convert import find_double_letter_fixes, normalize_text
+from ocr_dictionary import learn_corrections
+
+# Extraits du corpus (text/) : lettres étirées par l'OCR et tatweel décoratif
+TEXT = "المممممممادة 4 : إنجـــاز بتعييين المممقضممممممممماة الله"
+
+def test_double_letter_fix_without_dictionary_keeps_text():
+    # Sans dictionnaire appris, le texte sort octet pour octet identique
+    assert find_double_letter_fixes(TEXT, known={}) == {}
+    assert find_double_letter_fixes("المادة الأولى من هذا القانون", known={}) is None
+
+def test_double_letter_fix_uses_learned_forms():
+    vocabulary = Counter({"المادة": 40, "بتعيين": 3, "بتعين": 1, "إنجاز": 5})
+    vocabulary.update(TEXT.split())
+    known = learn_corrections(vocabulary)
+    # Forme attestée la plus fréquente ; ni tatweel replié, ni mot inconnu
+    assert find_double_letter_fixes(TEXT, known=known) == {
+        "المممممممادة": "المادة", "بتعييين": "بتعيين",
+    }
+
+def test_normalize_text_keeps_unknown_runs():
+    clean, _, double_fixes, _ = normalize_text("تطبق أحكام المممادة\nالأولى")
+    assert clean == "تطبق أحكام المممادة الأولى"
+    assert double_fixes == {}